@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class MainAppConfig(AppConfig):
     name = 'main_app'
+
+    def ready(self):
+        # Connects the cache invalidation receivers for session snapshots
+        from . import session_snapshot  # noqa: F401
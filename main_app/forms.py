@@ -239,6 +239,11 @@ class ChoiceForm(forms.ModelForm):
         fields = ["text", "is_correct"]
 
 class QuizSessionForm(forms.ModelForm):
+    sections = forms.IntegerField(
+        min_value=1, max_value=100, initial=1,
+        help_text="Number of parallel sessions to open, each with its own join code",
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'min': 1, 'max': 100}))
+
     class Meta:
         model = QuizSession
         fields = ['starts_at', 'ends_at', 'max_attempts_per_student', 'is_active']
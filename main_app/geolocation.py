@@ -0,0 +1,201 @@
+import csv
+import ipaddress
+import logging
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import connections, transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from . import http_client
+from .models import QuizAttempt
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=settings.GEOLOCATION_WORKERS, thread_name_prefix='geolocation')
+
+
+def ipapi_lookup(ip_address):
+    """Default resolver: asks ipapi.co for the (latitude, longitude) of an IP."""
+    response = http_client.get(f'https://ipapi.co/{ip_address}/json/')
+    response.raise_for_status()
+    data = response.json()
+    if data.get('error'):
+        return None
+    return data.get('latitude'), data.get('longitude')
+
+
+# Binary range file: little-endian (start, end, latitude, longitude) IPv4 records sorted by start
+RECORD = struct.Struct('<IIff')
+
+
+class RangeTable:
+    """
+    Sorted, non-overlapping IP ranges held in memory and searched with bisect.
+    IPv4 and IPv6 ranges are kept apart, since their integer values overlap.
+    """
+
+    def __init__(self, rows):
+        self.families = {}
+        for version in (4, 6):
+            family = sorted(row[1:] for row in rows if row[0] == version)
+            self.families[version] = ([row[0] for row in family], [row[1] for row in family],
+                                      [(row[2], row[3]) for row in family])
+
+    @classmethod
+    def from_csv(cls, path):
+        """Reads start_ip,end_ip,latitude,longitude lines (IPv4 or IPv6)."""
+        with open(path, newline='') as f:
+            return cls(list(parse_range_rows(csv.reader(f))))
+
+    def lookup(self, address):
+        starts, ends, locations = self.families[address.version]
+        ip = int(address)
+        index = bisect_right(starts, ip) - 1
+        if index >= 0 and ip <= ends[index]:
+            return locations[index]
+        return None
+
+
+class _MappedStarts:
+    """Sequence view over the start column of a mapped range file, for bisect."""
+
+    def __init__(self, buffer, count):
+        self.buffer = buffer
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return RECORD.unpack_from(self.buffer, index * RECORD.size)[0]
+
+
+class MappedRangeTable:
+    """
+    Same lookup over a binary range file opened with mmap, so every worker
+    process shares the page cache instead of holding its own copy. The file
+    only holds IPv4 ranges; an empty file is an empty table.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            # mmap refuses zero-length files
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+        self.starts = _MappedStarts(self.buffer, len(self.buffer) // RECORD.size)
+
+    def lookup(self, address):
+        if address.version != 4:
+            return None
+        ip = int(address)
+        index = bisect_right(self.starts, ip) - 1
+        if index < 0:
+            return None
+        start, end, latitude, longitude = RECORD.unpack_from(self.buffer, index * RECORD.size)
+        if ip <= end:
+            return latitude, longitude
+        return None
+
+
+def parse_range_rows(rows):
+    """Yields (ip version, start, end, latitude, longitude) for each CSV row."""
+    for row in rows:
+        if not row or row[0].startswith('#'):
+            continue
+        start, end, latitude, longitude = row[:4]
+        start, end = ipaddress.ip_address(start), ipaddress.ip_address(end)
+        if start.version != end.version:
+            raise ValueError("Range %s-%s mixes IPv4 and IPv6" % (start, end))
+        yield start.version, int(start), int(end), float(latitude), float(longitude)
+
+
+def write_range_file(rows, path):
+    """Writes IPv4 rows to the binary format read by MappedRangeTable; returns the record count."""
+    rows = sorted(row[1:] for row in rows if row[0] == 4)
+    with open(path, 'wb') as f:
+        for row in rows:
+            f.write(RECORD.pack(*row))
+    return len(rows)
+
+
+_range_table = None
+_range_table_lock = threading.Lock()
+
+
+def get_range_table():
+    """Loads GEOLOCATION_DATABASE once per process: .csv files into memory, anything else via mmap."""
+    global _range_table
+    if _range_table is None:
+        with _range_table_lock:
+            if _range_table is None:
+                path = str(settings.GEOLOCATION_DATABASE)
+                _range_table = RangeTable.from_csv(path) if path.endswith('.csv') else MappedRangeTable(path)
+    return _range_table
+
+
+@receiver(setting_changed)
+def reset_range_table(setting, **kwargs):
+    global _range_table
+    if setting == 'GEOLOCATION_DATABASE':
+        _range_table = None
+
+
+def local_lookup(ip_address):
+    """
+    Resolver backed by the local range file in GEOLOCATION_DATABASE, falling back to
+    GEOLOCATION_FALLBACK_RESOLVER (e.g. ipapi_lookup) for addresses it does not cover.
+    """
+    address = ipaddress.ip_address(ip_address)
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    location = get_range_table().lookup(address)
+    if location is None and settings.GEOLOCATION_FALLBACK_RESOLVER:
+        return import_string(settings.GEOLOCATION_FALLBACK_RESOLVER)(ip_address)
+    return location
+
+
+def resolve(ip_address):
+    """
+    Returns (latitude, longitude) or None, going through the cache first.
+    Unresolvable IPs are cached too so they are not retried on every submission.
+    """
+    key = 'geolocation:%s' % ip_address
+    location = cache.get(key)
+    if location is None:
+        location = import_string(settings.GEOLOCATION_RESOLVER)(ip_address) or ()
+        cache.set(key, tuple(location), settings.GEOLOCATION_CACHE_TTL)
+    return tuple(location) or None
+
+
+def locate_attempt(attempt_id, ip_address):
+    try:
+        location = resolve(ip_address)
+        if location:
+            latitude, longitude = location
+            QuizAttempt.objects.filter(id=attempt_id).update(latitude=latitude, longitude=longitude)
+    except Exception:
+        logger.warning("Could not get location for IP address %s", ip_address, exc_info=True)
+    finally:
+        if not settings.GEOLOCATION_EAGER:
+            connections.close_all()
+
+
+def locate_attempt_later(attempt_id, ip_address):
+    """
+    Fills in the attempt's latitude/longitude in a background worker once the
+    current transaction commits, so the request never waits on the lookup.
+    """
+    def enqueue():
+        if settings.GEOLOCATION_EAGER:
+            locate_attempt(attempt_id, ip_address)
+        else:
+            _executor.submit(locate_attempt, attempt_id, ip_address)
+    transaction.on_commit(enqueue)
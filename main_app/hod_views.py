@@ -1,33 +1,37 @@
-import json
-import requests
 from django.contrib import messages
 from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import Count
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import (HttpResponse, HttpResponseRedirect,
                               get_object_or_404, redirect, render)
-from django.templatetags.static import static
 from django.urls import reverse
+from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import UpdateView
 
 from .forms import *
 from .models import *
+from .notifications import push_later, push_many_later
+from .queries import attendance_report_rows, count_many
 
 
 def admin_home(request):
-    total_staff = Staff.objects.all().count()
-    total_students = Student.objects.all().count()
-    subjects = Subject.objects.all()
-    total_subject = subjects.count()
-    total_course = Course.objects.all().count()
-    attendance_list = Attendance.objects.filter(subject__in=subjects)
-    total_attendance = attendance_list.count()
-    attendance_list = []
+    totals = count_many(
+        total_staff=Staff.objects.all(),
+        total_students=Student.objects.all(),
+        total_course=Course.objects.all(),
+    )
+    subjects = Subject.objects.annotate(attendance_count=Count('attendance')).order_by('id').values_list('name', 'attendance_count')
     subject_list = []
-    for subject in subjects:
-        attendance_count = Attendance.objects.filter(subject=subject).count()
-        subject_list.append(subject.name[:7])
+    attendance_list = []
+    for name, attendance_count in subjects:
+        subject_list.append(name[:7])
         attendance_list.append(attendance_count)
+    total_subject = len(subject_list)
+    total_staff = totals['total_staff']
+    total_students = totals['total_students']
+    total_course = totals['total_course']
     context = {
         'page_title': "Administrative Dashboard",
         'total_students': total_students,
@@ -516,16 +520,7 @@ def get_admin_attendance(request):
         session = get_object_or_404(Session, id=session_id)
         attendance = get_object_or_404(
             Attendance, id=attendance_date_id, session=session)
-        attendance_reports = AttendanceReport.objects.filter(
-            attendance=attendance)
-        json_data = []
-        for report in attendance_reports:
-            data = {
-                "status":  str(report.status),
-                "name": str(report.student)
-            }
-            json_data.append(data)
-        return JsonResponse(json.dumps(json_data), safe=False)
+        return JsonResponse(attendance_report_rows(attendance), safe=False)
     except Exception as e:
         return None
 
@@ -578,7 +573,9 @@ def admin_notify_student(request):
     student = CustomUser.objects.filter(user_type=3)
     context = {
         'page_title': "Send Notifications To Students",
-        'students': student
+        'students': student,
+        'courses': Course.objects.all(),
+        'sessions': Session.objects.all()
     }
     return render(request, "hod_template/student_notification.html", context)
 
@@ -587,24 +584,12 @@ def admin_notify_student(request):
 def send_student_notification(request):
     id = request.POST.get('id')
     message = request.POST.get('message')
-    student = get_object_or_404(Student, admin_id=id)
+    student = get_object_or_404(Student.objects.select_related('admin'), admin_id=id)
     try:
-        url = "https://fcm.googleapis.com/fcm/send"
-        body = {
-            'notification': {
-                'title': "Student Management System",
-                'body': message,
-                'click_action': reverse('student_view_notification'),
-                'icon': static('dist/img/AdminLTELogo.png')
-            },
-            'to': student.admin.fcm_token
-        }
-        headers = {'Authorization':
-                   'key=AAAA3Bm8j_M:APA91bElZlOLetwV696SoEtgzpJr2qbxBfxVBfDWFiopBWzfCfzQp2nRyC7_A2mlukZEHV4g1AmyC6P_HonvSkY2YyliKt5tT3fe_1lrKod2Daigzhb2xnYQMxUWjCAIQcUexAMPZePB',
-                   'Content-Type': 'application/json'}
-        data = requests.post(url, data=json.dumps(body), headers=headers)
         notification = NotificationStudent(student=student, message=message)
         notification.save()
+        # Delivered to the device by the dispatch workers
+        push_later(student.admin, message, reverse('student_view_notification'))
         return HttpResponse("True")
     except Exception as e:
         return HttpResponse("False")
@@ -614,29 +599,55 @@ def send_student_notification(request):
 def send_staff_notification(request):
     id = request.POST.get('id')
     message = request.POST.get('message')
-    staff = get_object_or_404(Staff, admin_id=id)
+    staff = get_object_or_404(Staff.objects.select_related('admin'), admin_id=id)
     try:
-        url = "https://fcm.googleapis.com/fcm/send"
-        body = {
-            'notification': {
-                'title': "Student Management System",
-                'body': message,
-                'click_action': reverse('staff_view_notification'),
-                'icon': static('dist/img/AdminLTELogo.png')
-            },
-            'to': staff.admin.fcm_token
-        }
-        headers = {'Authorization':
-                   'key=AAAA3Bm8j_M:APA91bElZlOLetwV696SoEtgzpJr2qbxBfxVBfDWFiopBWzfCfzQp2nRyC7_A2mlukZEHV4g1AmyC6P_HonvSkY2YyliKt5tT3fe_1lrKod2Daigzhb2xnYQMxUWjCAIQcUexAMPZePB',
-                   'Content-Type': 'application/json'}
-        data = requests.post(url, data=json.dumps(body), headers=headers)
         notification = NotificationStaff(staff=staff, message=message)
         notification.save()
+        push_later(staff.admin, message, reverse('staff_view_notification'))
         return HttpResponse("True")
     except Exception as e:
         return HttpResponse("False")
 
 
+@login_required
+def send_bulk_notification(request):
+    """
+    Notifies every student of a course or session, or every student or staff
+    member, in one call: the notification rows go in with bulk_create and the
+    pushes are sent in multicast chunks. Only the HOD may broadcast.
+    """
+    if request.user.user_type != '1':
+        return JsonResponse({'error': "Only the HOD can send notifications"}, status=403)
+    target = request.POST.get('target')
+    target_id = request.POST.get('id', '')
+    message = request.POST.get('message', '').strip()
+    if target in ('course', 'session'):
+        if not target_id.isdigit():
+            return JsonResponse({'error': "A %s id is required" % target}, status=400)
+        get_object_or_404(Course if target == 'course' else Session, id=target_id)
+        recipients = Student.objects.filter(**{target + '_id': target_id})
+    elif target == 'students':
+        recipients = Student.objects.all()
+    elif target == 'staff':
+        recipients = Staff.objects.all()
+    else:
+        return JsonResponse({'error': "Unknown target"}, status=400)
+    if not message:
+        return JsonResponse({'error': "Message is required"}, status=400)
+    recipients = list(recipients.values_list('id', 'admin_id', 'admin__fcm_token'))
+    with transaction.atomic():
+        if target == 'staff':
+            NotificationStaff.objects.bulk_create(
+                [NotificationStaff(staff_id=pk, message=message) for pk, _, _ in recipients], batch_size=500)
+            click_action = reverse('staff_view_notification')
+        else:
+            NotificationStudent.objects.bulk_create(
+                [NotificationStudent(student_id=pk, message=message) for pk, _, _ in recipients], batch_size=500)
+            click_action = reverse('student_view_notification')
+        push_many_later([(admin_id, token) for _, admin_id, token in recipients], message, click_action)
+    return JsonResponse({'sent': len(recipients)})
+
+
 def delete_staff(request, staff_id):
     staff = get_object_or_404(CustomUser, staff__id=staff_id)
     staff.delete()
@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without calling out while a host's circuit breaker is open."""
+
+
+class HostClient:
+    """
+    Pooled keep-alive session for one host, with a circuit breaker and latency
+    counters. After OUTBOUND_HTTP_BREAKER_THRESHOLD consecutive failures
+    (connection errors, timeouts or 5xx) calls fail fast for
+    OUTBOUND_HTTP_BREAKER_COOLDOWN seconds, then one trial call is let through.
+    """
+
+    def __init__(self, host):
+        self.host = host
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=settings.OUTBOUND_HTTP_POOL_SIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._lock = threading.Lock()
+        self.consecutive_failures = 0
+        self.open_until = 0
+        self.calls = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def _allow(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.open_until > now:
+                return False
+            if self.open_until:
+                # Half-open: let this call through, keep others out until it reports back
+                self.open_until = now + settings.OUTBOUND_HTTP_BREAKER_COOLDOWN
+            return True
+
+    def _record(self, elapsed, failed):
+        with self._lock:
+            self.calls += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            if not failed:
+                self.consecutive_failures = 0
+                self.open_until = 0
+                return
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= settings.OUTBOUND_HTTP_BREAKER_THRESHOLD:
+                if not self.open_until:
+                    logger.warning("Opening circuit for %s after %d failures", self.host, self.consecutive_failures)
+                self.open_until = time.monotonic() + settings.OUTBOUND_HTTP_BREAKER_COOLDOWN
+
+    def request(self, method, url, **kwargs):
+        if not self._allow():
+            raise CircuitOpenError("Circuit open for %s" % self.host)
+        kwargs.setdefault('timeout', settings.OUTBOUND_HTTP_TIMEOUT)
+        started = time.monotonic()
+        response = None
+        try:
+            response = self.session.request(method, url, **kwargs)
+            return response
+        finally:
+            elapsed = time.monotonic() - started
+            self._record(elapsed, response is None or response.status_code >= 500)
+            logger.debug("%s %s -> %s in %.0f ms", method, url,
+                         response.status_code if response is not None else "error", elapsed * 1000)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'failures': self.failures,
+                'avg_ms': self.total_seconds / self.calls * 1000 if self.calls else 0,
+                'max_ms': self.max_seconds * 1000,
+                'circuit_open': self.open_until > time.monotonic(),
+            }
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def client_for(url):
+    parts = urlsplit(url)
+    host = '%s://%s' % (parts.scheme, parts.netloc)
+    with _clients_lock:
+        if host not in _clients:
+            _clients[host] = HostClient(host)
+        return _clients[host]
+
+
+def request(method, url, **kwargs):
+    """
+    Makes an outbound HTTP call through the host's pooled session. Uses the
+    OUTBOUND_HTTP_TIMEOUT (connect, read) timeouts unless `timeout` is given.
+    """
+    return client_for(url).request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def latency_stats():
+    """Per-host call counts, failures, average/max latency and breaker state."""
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {client.host: client.stats() for client in clients}
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import QuizAttempt, QuizSession
+
+
+def score_bin(score, total_marks):
+    """Index of the 10%-wide histogram bin a score falls in, matching the dashboard's SQL bins."""
+    safe_total_marks = total_marks if total_marks > 0 else 1
+    for index in range(9, 0, -1):
+        if score >= safe_total_marks * index / 10:
+            return index
+    return 0
+
+
+class SessionAccumulator:
+    """
+    Running statistics for one quiz session. Scores are folded in one at a
+    time with Welford's update, so the mean and variance never need a rescan.
+    """
+
+    def __init__(self, total_marks):
+        self.total_marks = total_marks
+        self.joined = set()
+        self.submitted = set()
+        self.students = set()
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.bins = [0] * 10
+
+    @property
+    def variance(self):
+        # Population variance, the same as the dashboard's StdDev('score')
+        return self.m2 / self.count if self.count else 0.0
+
+    def add(self, attempt_id, student_id, status, score):
+        """Folds in one attempt row. Returns the histogram bin it was counted in, if any."""
+        self.joined.add(student_id)
+        if status != QuizAttempt.STATUS_SUBMITTED or attempt_id in self.submitted:
+            return None
+        self.submitted.add(attempt_id)
+        self.students.add(student_id)
+        self.count += 1
+        delta = score - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (score - self.mean)
+        index = score_bin(score, self.total_marks)
+        self.bins[index] += 1
+        return index
+
+    def as_dict(self):
+        return {
+            'joined': len(self.joined),
+            'submitted': self.count,
+            'students': len(self.students),
+            'mean': self.mean,
+            'variance': self.variance,
+            'std_dev': self.variance ** 0.5,
+        }
+
+
+def sse_event(event, data):
+    return 'event: %s\ndata: %s\n\n' % (event, json.dumps(data))
+
+
+async def session_events(session):
+    """
+    Server-sent events for a live session dashboard. The first event is a full
+    snapshot; afterwards only attempts started or submitted since the previous
+    poll are read, and an update carries the new totals and histogram deltas.
+    The stream closes once the session is deactivated or ends, and in any case
+    after SESSION_LIVE_MAX_SECONDS.
+    """
+    accumulator = SessionAccumulator(session.quiz.total_marks)
+    # Rows are re-read for a short overlap so attempts committed out of order are not missed;
+    # the accumulator ignores anything it has already counted.
+    overlap = timedelta(seconds=settings.SESSION_LIVE_OVERLAP)
+    since = timezone.now()
+    async for row in session.attempts.order_by().values_list('id', 'student_id', 'status', 'score'):
+        accumulator.add(*row)
+    yield sse_event('snapshot', {**accumulator.as_dict(), 'histogram': accumulator.bins})
+
+    deadline = time.monotonic() + settings.SESSION_LIVE_MAX_SECONDS
+    idle_polls = 0
+    while time.monotonic() < deadline:
+        await asyncio.sleep(settings.SESSION_LIVE_POLL_INTERVAL)
+        # Re-read the flags each poll so deactivating or rescheduling the session ends the stream
+        state = await QuizSession.objects.filter(id=session.id).values_list('is_active', 'ends_at').afirst()
+        if state is None or not state[0] or (state[1] and timezone.now() > state[1]):
+            break
+        poll_started = timezone.now()
+        recent = session.attempts.filter(
+            Q(started_at__gte=since - overlap) | Q(submitted_at__gte=since - overlap)).order_by()
+        joined = len(accumulator.joined)
+        histogram_delta = [0] * 10
+        async for row in recent.values_list('id', 'student_id', 'status', 'score'):
+            index = accumulator.add(*row)
+            if index is not None:
+                histogram_delta[index] += 1
+        since = poll_started
+        if any(histogram_delta) or len(accumulator.joined) != joined:
+            idle_polls = 0
+            yield sse_event('update', {**accumulator.as_dict(), 'histogram_delta': histogram_delta})
+        else:
+            idle_polls += 1
+            if idle_polls * settings.SESSION_LIVE_POLL_INTERVAL >= 15:
+                # Comment line so proxies keep an idle stream open
+                idle_polls = 0
+                yield ': keep-alive\n\n'
+    yield sse_event('closed', accumulator.as_dict())
@@ -0,0 +1,18 @@
+import csv
+
+from django.core.management.base import BaseCommand
+
+from main_app.geolocation import parse_range_rows, write_range_file
+
+
+class Command(BaseCommand):
+    help = "Compiles a start_ip,end_ip,latitude,longitude CSV into the memory-mapped range file used for geolocation."
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('output_path')
+
+    def handle(self, *args, **options):
+        with open(options['csv_path'], newline='') as f:
+            count = write_range_file(parse_range_rows(csv.reader(f)), options['output_path'])
+        self.stdout.write(self.style.SUCCESS("Wrote %d IPv4 ranges to %s" % (count, options['output_path'])))
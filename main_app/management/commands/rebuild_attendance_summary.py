@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from main_app.models import AttendanceSummary
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the AttendanceSummary table from AttendanceReport rows."
+
+    def handle(self, *args, **options):
+        rows = AttendanceSummary.rebuild()
+        self.stdout.write(self.style.SUCCESS("Rebuilt %d attendance summary rows" % len(rows)))
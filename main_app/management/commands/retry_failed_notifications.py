@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from main_app.models import FailedNotification
+from main_app.notifications import enqueue
+
+
+class Command(BaseCommand):
+    help = "Queues dead-lettered push notifications for delivery again."
+
+    def handle(self, *args, **options):
+        failed = list(FailedNotification.objects.select_related('recipient'))
+        # Rows whose recipient has no device token yet stay put until they can be sent
+        retryable = [notification for notification in failed if notification.recipient.fcm_token]
+        for notification in retryable:
+            enqueue([(notification.recipient_id, notification.recipient.fcm_token)], notification.payload)
+        FailedNotification.objects.filter(id__in=[notification.id for notification in retryable]).delete()
+        self.stdout.write(self.style.SUCCESS("Queued %d failed notifications" % len(retryable)))
+        if len(retryable) != len(failed):
+            self.stdout.write("Skipped %d without a device token" % (len(failed) - len(retryable)))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_summary(apps, schema_editor):
+    AttendanceReport = apps.get_model('main_app', 'AttendanceReport')
+    AttendanceSummary = apps.get_model('main_app', 'AttendanceSummary')
+    counts = AttendanceReport.objects.values(
+        'student', 'attendance__subject', 'attendance__session').annotate(
+        present=models.Count('id', filter=models.Q(status=True)), total=models.Count('id')).order_by()
+    AttendanceSummary.objects.bulk_create(
+        [AttendanceSummary(student_id=row['student'], subject_id=row['attendance__subject'],
+                           session_id=row['attendance__session'], present=row['present'], total=row['total'])
+         for row in counts], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0002_quiz'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main_app.session')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main_app.student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main_app.subject')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('student', 'subject', 'session'), name='unique_attendance_summary')],
+            },
+        ),
+        migrations.RunPython(backfill_summary, migrations.RunPython.noop),
+    ]
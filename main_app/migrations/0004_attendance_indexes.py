@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0003_attendancesummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['subject', 'date'], name='attendance_subject_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancereport',
+            index=models.Index(fields=['student', 'attendance'], name='report_student_attendance_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations, models
+
+
+def dedupe_attendance(apps, schema_editor):
+    """
+    Collapses duplicate Attendance (session, subject, date) and AttendanceReport (student, attendance)
+    rows onto the oldest row so the unique constraints in 0006 can be added.
+    """
+    Attendance = apps.get_model('main_app', 'Attendance')
+    AttendanceReport = apps.get_model('main_app', 'AttendanceReport')
+    AttendanceSummary = apps.get_model('main_app', 'AttendanceSummary')
+
+    duplicates = Attendance.objects.values('session', 'subject', 'date').annotate(
+        keep=models.Min('id'), rows=models.Count('id')).filter(rows__gt=1).order_by()
+    for group in duplicates:
+        extra = Attendance.objects.filter(
+            session=group['session'], subject=group['subject'], date=group['date']).exclude(id=group['keep'])
+        AttendanceReport.objects.filter(attendance__in=extra).update(attendance_id=group['keep'])
+        extra.delete()
+
+    duplicates = AttendanceReport.objects.values('student', 'attendance').annotate(
+        keep=models.Min('id'), rows=models.Count('id')).filter(rows__gt=1).order_by()
+    for group in duplicates:
+        AttendanceReport.objects.filter(
+            student=group['student'], attendance=group['attendance']).exclude(id=group['keep']).delete()
+
+    # Counters were built from the duplicated reports, recompute them
+    counts = AttendanceReport.objects.values(
+        'student', 'attendance__subject', 'attendance__session').annotate(
+        present=models.Count('id', filter=models.Q(status=True)), total=models.Count('id')).order_by()
+    AttendanceSummary.objects.all().delete()
+    AttendanceSummary.objects.bulk_create(
+        [AttendanceSummary(student_id=row['student'], subject_id=row['attendance__subject'],
+                           session_id=row['attendance__session'], present=row['present'], total=row['total'])
+         for row in counts], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0004_attendance_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_attendance, migrations.RunPython.noop),
+    ]
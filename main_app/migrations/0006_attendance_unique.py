@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0005_dedupe_attendance'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='attendancereport',
+            name='report_student_attendance_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(fields=('session', 'subject', 'date'), name='unique_attendance_per_day'),
+        ),
+        migrations.AddConstraint(
+            model_name='attendancereport',
+            constraint=models.UniqueConstraint(fields=('student', 'attendance'), name='unique_attendance_report'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:46
+
+from django.db import migrations, models
+
+
+def backfill_totals(apps, schema_editor):
+    Quiz = apps.get_model('main_app', 'Quiz')
+    Question = apps.get_model('main_app', 'Question')
+    totals = Question.objects.values('quiz').annotate(
+        total=models.Sum('marks'), count=models.Count('id')).order_by()
+    for row in totals:
+        Quiz.objects.filter(id=row['quiz']).update(total_marks=row['total'], question_count=row['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0006_attendance_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='total_marks',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:52
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0007_quiz_totals'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='quizsession',
+            name='qr_code',
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0008_quizsession_remove_qr_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FailedNotification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField()),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -1,16 +1,17 @@
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import UserManager
 from django.dispatch import receiver
-from django.db.models.signals import post_save
-from django.db import models
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
 import secrets
-from io import BytesIO
-from django.core.files import File
 from django.utils import timezone
 from django.utils.crypto import get_random_string
 
-import qrcode  # Ensure you have the qrcode library installed: pip install qrcode[pil]
 
 
 
@@ -117,6 +118,14 @@ class Attendance(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['subject', 'date'], name='attendance_subject_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'subject', 'date'], name='unique_attendance_per_day'),
+        ]
+
 
 class AttendanceReport(models.Model):
     student = models.ForeignKey(Student, on_delete=models.DO_NOTHING)
@@ -125,6 +134,85 @@ class AttendanceReport(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'attendance'], name='unique_attendance_report'),
+        ]
+
+
+class AttendanceSummary(models.Model):
+    """
+    Present/total counters per (student, subject, session), kept in step with AttendanceReport
+    so dashboards read one row per subject instead of scanning every report.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    session = models.ForeignKey(Session, on_delete=models.CASCADE)
+    present = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'subject', 'session'], name='unique_attendance_summary'),
+        ]
+
+    @property
+    def absent(self):
+        return self.total - self.present
+
+    @classmethod
+    def _rows(cls, attendance, student_ids):
+        cls.objects.bulk_create(
+            [cls(student_id=student_id, subject_id=attendance.subject_id, session_id=attendance.session_id)
+             for student_id in student_ids], ignore_conflicts=True)
+        return cls.objects.filter(subject_id=attendance.subject_id, session_id=attendance.session_id)
+
+    @classmethod
+    def add_reports(cls, attendance, reports):
+        """Counts newly created reports of an attendance."""
+        if not reports:
+            return
+        present_ids = [report.student_id for report in reports if report.status]
+        absent_ids = [report.student_id for report in reports if not report.status]
+        rows = cls._rows(attendance, present_ids + absent_ids)
+        if present_ids:
+            rows.filter(student_id__in=present_ids).update(present=F('present') + 1, total=F('total') + 1)
+        if absent_ids:
+            rows.filter(student_id__in=absent_ids).update(total=F('total') + 1)
+
+    @classmethod
+    def apply_status_changes(cls, attendance, reports):
+        """Moves counters for reports whose status was just flipped."""
+        now_present = [report.student_id for report in reports if report.status]
+        now_absent = [report.student_id for report in reports if not report.status]
+        rows = cls.objects.filter(subject_id=attendance.subject_id, session_id=attendance.session_id)
+        if now_present:
+            rows.filter(student_id__in=now_present).update(present=F('present') + 1)
+        if now_absent:
+            rows.filter(student_id__in=now_absent).update(present=F('present') - 1)
+
+    @classmethod
+    def remove_reports(cls, attendance):
+        """Uncounts every report of an attendance that is about to be deleted, in two UPDATEs."""
+        reports = AttendanceReport.objects.filter(attendance=attendance)
+        rows = cls.objects.filter(subject_id=attendance.subject_id, session_id=attendance.session_id)
+        rows.filter(student_id__in=reports.filter(status=True).values('student_id')).update(
+            present=F('present') - 1, total=F('total') - 1)
+        rows.filter(student_id__in=reports.filter(status=False).values('student_id')).update(total=F('total') - 1)
+
+    @classmethod
+    def rebuild(cls):
+        """Recomputes every row from AttendanceReport."""
+        counts = AttendanceReport.objects.values(
+            'student', 'attendance__subject', 'attendance__session').annotate(
+            present=models.Count('id', filter=models.Q(status=True)), total=models.Count('id')).order_by()
+        with transaction.atomic():
+            cls.objects.all().delete()
+            return cls.objects.bulk_create(
+                [cls(student_id=row['student'], subject_id=row['attendance__subject'],
+                     session_id=row['attendance__session'], present=row['present'], total=row['total'])
+                 for row in counts], batch_size=500)
+
 
 class LeaveReportStudent(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
@@ -174,6 +262,18 @@ class NotificationStudent(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
 
+class FailedNotification(models.Model):
+    """
+    Dead-letter entry for a push notification that could not be delivered;
+    `manage.py retry_failed_notifications` queues them again.
+    """
+    recipient = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    payload = models.JSONField()
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
 class StudentResult(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
@@ -203,6 +303,44 @@ def save_user_profile(sender, instance, **kwargs):
     if instance.user_type == 3:
         instance.student.save()
 
+def staff_home_cache_key(staff_id):
+    return 'staff_home:%s' % staff_id
+
+
+@receiver([post_save, post_delete], sender=Attendance)
+def invalidate_staff_home_for_attendance(sender, instance, **kwargs):
+    if not settings.STAFF_HOME_CACHE_TIMEOUT:
+        return
+    staff_ids = Subject.objects.filter(id=instance.subject_id).values_list('staff_id', flat=True)
+    cache.delete_many([staff_home_cache_key(staff_id) for staff_id in staff_ids])
+
+
+@receiver([post_save, post_delete], sender=LeaveReportStaff)
+def invalidate_staff_home(sender, instance, **kwargs):
+    cache.delete(staff_home_cache_key(instance.staff_id))
+
+
+@receiver(pre_save, sender=Subject)
+def remember_previous_subject_staff(sender, instance, **kwargs):
+    # A reassigned subject leaves the previous staff member's dashboard stale too
+    instance._previous_staff_id = None
+    if settings.STAFF_HOME_CACHE_TIMEOUT and instance.pk:
+        instance._previous_staff_id = Subject.objects.filter(pk=instance.pk).values_list(
+            'staff_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Subject)
+def invalidate_staff_home_for_subject(sender, instance, **kwargs):
+    staff_ids = {instance.staff_id, getattr(instance, '_previous_staff_id', None)} - {None}
+    cache.delete_many([staff_home_cache_key(staff_id) for staff_id in staff_ids])
+
+@receiver(pre_delete, sender=Attendance)
+def remove_attendance_from_summary(sender, instance, **kwargs):
+    # Adjusted per attendance rather than per report: a delete receiver on AttendanceReport
+    # would make every cascade fetch and signal each report row. Reports are only ever
+    # removed through their attendance; deleting one on its own needs AttendanceSummary.rebuild()
+    AttendanceSummary.remove_reports(instance)
+
 class Quiz(models.Model):
     """
     Quiz created by staff for specific subject.
@@ -212,6 +350,9 @@ class Quiz(models.Model):
     description = models.TextField(blank=True, null=True)
     duration_minutes = models.PositiveIntegerField(default=10)
     created_by = models.ForeignKey(Staff, on_delete=models.CASCADE, related_name="quizzes")
+    # Denormalized from the questions, kept in step by refresh_totals()
+    total_marks = models.FloatField(default=0)
+    question_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -221,6 +362,19 @@ class Quiz(models.Model):
 
     def __str__(self):
         return self.title
+
+    @classmethod
+    def refresh_totals(cls, quiz_id):
+        """
+        Recomputes total_marks and question_count in a single UPDATE. updated_at
+        moves too, which retires the compiled payload cached under the old value.
+        """
+        questions = Question.objects.filter(quiz=OuterRef('pk')).order_by().values('quiz')
+        cls.objects.filter(id=quiz_id).update(
+            total_marks=Coalesce(Subquery(questions.annotate(total=Sum('marks')).values('total')), 0.0),
+            question_count=Coalesce(Subquery(questions.annotate(count=Count('id')).values('count')), 0),
+            updated_at=timezone.now(),
+        )
     
 class Question(models.Model):
     """
@@ -257,24 +411,54 @@ class Choice(models.Model):
     def __str__(self):
         return f"{'✔' if self.is_correct else '✘'} {self.text[:40]}"
     
+def quiz_payload_cache_key(quiz):
+    # Keyed on updated_at so an edit made in any process retires every worker's copy
+    return 'quiz_payload:%s:%s' % (quiz.id, quiz.updated_at.isoformat())
+
+
+@receiver([post_save, post_delete], sender=Question)
+def refresh_quiz_for_question(sender, instance, **kwargs):
+    Quiz.refresh_totals(instance.quiz_id)
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def invalidate_quiz_payload_for_choice(sender, instance, **kwargs):
+    Quiz.objects.filter(questions__id=instance.question_id).update(updated_at=timezone.now())
+
+SESSION_CODE_ATTEMPTS = 10
+
+
+def session_window_open(is_active, starts_at, ends_at):
+    """True if a session is active and now falls within its optional start and end times."""
+    now = timezone.now()
+    if not is_active:
+        return False
+    # If a start time is set, the session is not open yet if 'now' is before it.
+    if starts_at and now < starts_at:
+        return False
+    # If an end time is set, the session is closed if 'now' is after it.
+    if ends_at and now > ends_at:
+        return False
+    # Otherwise, the session is open.
+    return True
+
+
 def _generate_session_code():
     """
-    Generates an unambiguous 6-char code (A-Z, 2-9) and ensures uniqueness.
+    Generates an unambiguous 6-char code (A-Z, 2-9). Uniqueness is left to the
+    unique index on session_code; callers retry on IntegrityError.
     """
     alphabet = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"  # no I/O/1/0
-    while True:
-        code = get_random_string(6, allowed_chars=alphabet)
-        if not QuizSession.objects.filter(session_code=code).exists():
-            return code
+    return get_random_string(6, allowed_chars=alphabet)
 
 class QuizSession(models.Model):
     """
-    A joinable/live session for a quiz. The save() method handles code generation.
+    A joinable/live session for a quiz. The save() method handles code generation;
+    the QR code is rendered on demand by the session_qr view.
     """
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name="sessions")
     created_by = models.ForeignKey(Staff, on_delete=models.PROTECT, related_name="quiz_sessions")
     session_code = models.CharField(max_length=10, unique=True, db_index=True, blank=True)
-    qr_code = models.ImageField(upload_to="quiz_sessions/qrcodes/", blank=True, null=True)
     is_active = models.BooleanField(default=True)
     starts_at = models.DateTimeField(blank=True, null=True)
     ends_at = models.DateTimeField(blank=True, null=True)
@@ -290,50 +474,55 @@ class QuizSession(models.Model):
         Returns True if the session is active and the current time is
         within the optional start and end times.
         """
-        now = timezone.now()
-        if not self.is_active:
-            return False
-        # If a start time is set, the session is not open yet if 'now' is before it.
-        if self.starts_at and now < self.starts_at:
-            return False
-        # If an end time is set, the session is closed if 'now' is after it.
-        if self.ends_at and now > self.ends_at:
-            return False
-        # Otherwise, the session is open.
-        return True
+        return session_window_open(self.is_active, self.starts_at, self.ends_at)
 
     def __str__(self):
         return f"{self.quiz.title} [{self.session_code}]"
 
     def save(self, *args, **kwargs):
-        # --- THIS IS THE CRITICAL LOGIC ---
-        # 1. Generate a unique session code ONLY when creating a new session.
-        if not self.pk: # self.pk is None if the object is new
+        # A new session gets a code at INSERT time; a collision with the unique
+        # index is retried with a fresh code instead of probing for it first.
+        if self.pk or self.session_code:
+            return super().save(*args, **kwargs)
+        for _ in range(SESSION_CODE_ATTEMPTS - 1):
             self.session_code = _generate_session_code()
-
-        # 2. Call the original save() method to save the object and session_code to the DB.
-        super().save(*args, **kwargs)
-
-        # 3. Generate a QR code ONLY if one doesn't already exist.
-        if not self.qr_code:
             try:
-                # The data for the QR code is the session code itself
-                qr_img = qrcode.make(self.session_code)
-                
-                # Save the generated image to a temporary buffer in memory
-                buffer = BytesIO()
-                qr_img.save(buffer, format="PNG")
-                filename = f"{self.session_code}.png"
-                
-                # Save the buffer's content to the ImageField without calling save() again
-                self.qr_code.save(filename, File(buffer), save=False)
-                
-                # Now, update ONLY the qr_code field in the database in a separate, efficient query.
-                super().save(update_fields=['qr_code'])
-
-            except ImportError:
-                # If the qrcode library isn't installed, this will prevent a crash.
-                pass
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if not QuizSession.objects.filter(session_code=self.session_code).exists():
+                    raise
+                self.pk = None
+        self.session_code = _generate_session_code()
+        return super().save(*args, **kwargs)
+
+    @classmethod
+    def create_many(cls, sessions):
+        """
+        Inserts many new sessions (e.g. one per section on an exam day) with a
+        single bulk INSERT, giving each a unique code. Codes that collide with
+        existing sessions are regenerated and the batch retried.
+        """
+        for session in sessions:
+            session.session_code = _generate_session_code()
+        for _ in range(SESSION_CODE_ATTEMPTS):
+            codes = [session.session_code for session in sessions]
+            if len(set(codes)) == len(codes):
+                try:
+                    with transaction.atomic():
+                        return cls.objects.bulk_create(sessions)
+                except IntegrityError:
+                    taken = set(cls.objects.filter(session_code__in=codes).values_list('session_code', flat=True))
+                    if not taken:
+                        raise
+            else:
+                taken = set()
+            seen = set()
+            for session in sessions:
+                if session.session_code in taken or session.session_code in seen:
+                    session.session_code = _generate_session_code()
+                seen.add(session.session_code)
+        raise IntegrityError("Could not allocate unique session codes")
 
 
 class QuizAttempt(models.Model):
@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.db import connections, transaction
+from django.templatetags.static import static
+
+from . import http_client
+from .models import FailedNotification
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=settings.NOTIFICATION_WORKERS, thread_name_prefix='notifications')
+# Caps how many push requests may wait for a worker; beyond that they go straight to the dead-letter table
+_queue_slots = threading.BoundedSemaphore(settings.NOTIFICATION_QUEUE_SIZE)
+
+# FCM per-message errors worth another try; anything else (e.g. NotRegistered) is final
+RETRYABLE_FCM_ERRORS = {'Unavailable', 'InternalServerError'}
+
+
+class RetryablePushError(Exception):
+    pass
+
+
+class PushRejected(Exception):
+    pass
+
+
+def push_notification(message, click_action):
+    return {
+        'title': "Student Management System",
+        'body': message,
+        'click_action': click_action,
+        'icon': static('dist/img/AdminLTELogo.png')
+    }
+
+
+def send_push(tokens, notification):
+    """
+    Posts one notification to up to FCM_MULTICAST_SIZE device tokens in a single
+    request. Returns the FCM error for each token (None when delivered); raises
+    RetryablePushError or PushRejected when the whole request fails.
+    """
+    body = {'notification': notification}
+    if len(tokens) == 1:
+        body['to'] = tokens[0]
+    else:
+        body['registration_ids'] = tokens
+    response = http_client.post(settings.FCM_URL, json=body,
+                                headers={'Authorization': 'key=' + settings.FCM_SERVER_KEY})
+    if response.status_code == 429 or response.status_code >= 500:
+        raise RetryablePushError("FCM responded %s" % response.status_code)
+    if response.status_code >= 400:
+        raise PushRejected("FCM responded %s" % response.status_code)
+    results = response.json().get('results', [])
+    return [result.get('error') for result in results] + [None] * (len(tokens) - len(results))
+
+
+def deliver(recipients, notification):
+    """
+    Sends a notification to (user_id, token) recipients, retrying transient
+    failures with exponential backoff for just the tokens that hit them.
+    Recipients whose retries run out, or that FCM rejects, are kept as FailedNotification rows.
+    """
+    pending = list(recipients)
+    failed = []
+    try:
+        for attempt in range(1, settings.NOTIFICATION_MAX_ATTEMPTS + 1):
+            retry = []
+            try:
+                errors = send_push([token for _, token in pending], notification)
+            except (RetryablePushError, requests.ConnectionError, requests.Timeout) as e:
+                retry = [(recipient, str(e)) for recipient in pending]
+            except Exception as e:
+                failed += [(recipient, str(e), attempt) for recipient in pending]
+            else:
+                for recipient, error in zip(pending, errors):
+                    if error in RETRYABLE_FCM_ERRORS:
+                        retry.append((recipient, error))
+                    elif error:
+                        failed.append((recipient, error, attempt))
+            if not retry:
+                break
+            if attempt == settings.NOTIFICATION_MAX_ATTEMPTS:
+                failed += [(recipient, error, attempt) for recipient, error in retry]
+                break
+            pending = [recipient for recipient, _ in retry]
+            time.sleep(settings.NOTIFICATION_RETRY_BACKOFF * 2 ** (attempt - 1))
+        if failed:
+            logger.warning("Could not deliver notification to %d recipients", len(failed))
+            FailedNotification.objects.bulk_create([
+                FailedNotification(recipient_id=user_id, payload=notification, attempts=attempts, error=error)
+                for (user_id, _), error, attempts in failed])
+    finally:
+        if not settings.NOTIFICATION_EAGER:
+            connections.close_all()
+
+
+def _run(recipients, notification):
+    try:
+        deliver(recipients, notification)
+    finally:
+        _queue_slots.release()
+
+
+def push_later(user, message, click_action):
+    """
+    Queues a push notification to the user's device for the dispatch workers,
+    once the current transaction commits. The request never waits on FCM.
+    """
+    if user.fcm_token:
+        enqueue([(user.id, user.fcm_token)], push_notification(message, click_action))
+
+
+def push_many_later(recipients, message, click_action):
+    """Queues one notification for many (user_id, fcm_token) recipients, in multicast chunks."""
+    recipients = [(user_id, token) for user_id, token in recipients if token]
+    notification = push_notification(message, click_action)
+    for start in range(0, len(recipients), settings.FCM_MULTICAST_SIZE):
+        enqueue(recipients[start:start + settings.FCM_MULTICAST_SIZE], notification)
+
+
+def enqueue(recipients, notification):
+    def submit():
+        if settings.NOTIFICATION_EAGER:
+            deliver(recipients, notification)
+        elif _queue_slots.acquire(blocking=False):
+            _executor.submit(_run, recipients, notification)
+        else:
+            FailedNotification.objects.bulk_create([
+                FailedNotification(recipient_id=user_id, payload=notification, attempts=0, error="Dispatch queue full")
+                for user_id, _ in recipients])
+    transaction.on_commit(submit)
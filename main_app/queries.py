@@ -0,0 +1,32 @@
+from django.db import connection
+
+from .models import AttendanceReport
+
+
+def count_many(**querysets):
+    """
+    Counts several querysets in a single round-trip, e.g.
+    SELECT (SELECT COUNT(*) FROM (...)), (SELECT COUNT(*) FROM (...))
+    Returns a dict mapping each keyword to its count.
+    """
+    columns = []
+    params = []
+    for name, queryset in querysets.items():
+        sql, query_params = queryset.order_by().values('pk').query.sql_with_params()
+        columns.append('(SELECT COUNT(*) FROM (%s) counted_%s)' % (sql, name))
+        params.extend(query_params)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(columns), params)
+        return dict(zip(querysets, cursor.fetchone()))
+
+
+def attendance_report_rows(attendance):
+    """
+    Status and student name for every report of an attendance, in one joined query.
+    Rows look like {"id": <student admin id>, "name": "Last First", "status": true}.
+    """
+    reports = AttendanceReport.objects.filter(attendance=attendance).order_by(
+        'student__admin__last_name', 'student__admin__first_name').values_list(
+        'student__admin_id', 'student__admin__last_name', 'student__admin__first_name', 'status')
+    return [{"id": admin_id, "name": last_name + " " + first_name, "status": status}
+            for admin_id, last_name, first_name, status in reports]
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import Question, quiz_payload_cache_key
+
+
+def compile_quiz(quiz_id):
+    questions = []
+    choice_map = {}
+    for question in Question.objects.filter(quiz_id=quiz_id).prefetch_related('choices'):
+        choices = []
+        for choice in question.choices.all():
+            choices.append({'id': choice.id, 'text': choice.text})
+            choice_map[choice.id] = (question.id, choice.is_correct)
+        questions.append({'id': question.id, 'text': question.text, 'marks': question.marks, 'choices': choices})
+    return {
+        'questions': questions,
+        'choice_map': choice_map,
+        'total_marks': sum(question['marks'] for question in questions),
+        'questions_html': render_to_string('student_template/quiz_questions.html', {'questions': questions}),
+    }
+
+
+def get_quiz_payload(quiz):
+    """
+    Compiled form of a quiz shared by every student taking it: ordered questions with
+    their choices, total marks, a {choice_id: (question_id, is_correct)} map for grading
+    and the pre-rendered question markup. Question/Choice saves and deletes bump
+    quiz.updated_at, so a stale copy is never read again.
+    """
+    key = quiz_payload_cache_key(quiz)
+    payload = cache.get(key)
+    if payload is None:
+        payload = compile_quiz(quiz.id)
+        cache.set(key, payload, settings.QUIZ_PAYLOAD_CACHE_TIMEOUT)
+    payload['questions_html'] = mark_safe(payload['questions_html'])
+    return payload
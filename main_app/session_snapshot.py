@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Question, Quiz, QuizSession, session_window_open
+
+
+class SessionSnapshot(NamedTuple):
+    """The parts of a QuizSession that joining students need, frozen at read time."""
+    id: int
+    session_code: str
+    quiz_id: int
+    quiz_title: str
+    subject_name: str
+    duration_minutes: int
+    question_count: int
+    is_active: bool
+    starts_at: Optional[datetime]
+    ends_at: Optional[datetime]
+    max_attempts_per_student: int
+
+    @property
+    def is_open_now(self):
+        return session_window_open(self.is_active, self.starts_at, self.ends_at)
+
+
+FIELDS = ('id', 'session_code', 'quiz_id', 'quiz__title', 'quiz__subject__name', 'quiz__duration_minutes',
+          'quiz__question_count',
+          'is_active', 'starts_at', 'ends_at', 'max_attempts_per_student')
+
+
+class LRUCache:
+    """A small thread-safe LRU whose entries also expire, bounding staleness across processes."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_local = LRUCache(settings.SESSION_SNAPSHOT_LRU_SIZE, settings.SESSION_SNAPSHOT_LOCAL_TTL)
+
+
+def _cache_key(field, value):
+    return 'session_snapshot:%s:%s' % (field, value)
+
+
+def _shared_cache():
+    # A local-memory cache lives in one process, so invalidations made elsewhere never reach it
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def _lookup(field, value):
+    key = _cache_key(field, value)
+    snapshot = _local.get(key)
+    if snapshot is not None:
+        return snapshot
+    shared = _shared_cache()
+    snapshot = cache.get(key) if shared else None
+    if snapshot is None:
+        row = QuizSession.objects.filter(**{field: value}).values_list(*FIELDS).first()
+        if row is None:
+            return None
+        snapshot = SessionSnapshot(*row)
+        if shared:
+            cache.set_many({_cache_key('id', snapshot.id): snapshot,
+                            _cache_key('session_code', snapshot.session_code): snapshot},
+                           settings.SESSION_SNAPSHOT_CACHE_TIMEOUT)
+    _local.set(key, snapshot)
+    return snapshot
+
+
+def get_session_snapshot(session_id):
+    """
+    Snapshot of a session by id, or None. Served from the in-process LRU, then
+    the shared cache (when CACHES is shared between processes), and only then
+    the database.
+    """
+    return _lookup('id', session_id)
+
+
+def get_session_snapshot_by_code(session_code):
+    """Snapshot of the session with this join code, or None."""
+    return _lookup('session_code', session_code)
+
+
+def forget_sessions(sessions):
+    """Drops the snapshots of the given (id, session_code) pairs from both cache layers."""
+    keys = []
+    for session_id, session_code in sessions:
+        keys += [_cache_key('id', session_id), _cache_key('session_code', session_code)]
+    _local.delete(*keys)
+    cache.delete_many(keys)
+
+
+@receiver([post_save, post_delete], sender=QuizSession)
+def invalidate_session_snapshot(sender, instance, **kwargs):
+    forget_sessions([(instance.id, instance.session_code)])
+
+
+@receiver(post_save, sender=Quiz)
+def invalidate_session_snapshots_for_quiz(sender, instance, created, **kwargs):
+    if not created:
+        forget_sessions(instance.sessions.values_list('id', 'session_code'))
+
+
+@receiver([post_save, post_delete], sender=Question)
+def invalidate_session_snapshots_for_question(sender, instance, **kwargs):
+    # question_count is part of the snapshot
+    forget_sessions(QuizSession.objects.filter(quiz_id=instance.quiz_id).values_list('id', 'session_code'))
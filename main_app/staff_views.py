@@ -1,43 +1,80 @@
 import json
+import math
+from io import BytesIO
 
+import qrcode
+import qrcode.image.svg
+
+from django.conf import settings
 from django.contrib import messages
+from django.core.cache import cache
 from django.core.files.storage import FileSystemStorage
-from django.http import HttpResponse, JsonResponse
-from django.shortcuts import (HttpResponseRedirect, get_object_or_404,redirect, render)
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.shortcuts import (HttpResponseRedirect, aget_object_or_404, get_object_or_404,redirect, render)
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from django.forms import formset_factory
-from django.db.models import Avg, Max, Min, StdDev, Count
+from django.core.paginator import Paginator
+from django.db.models import Avg, Case, Count, F, IntegerField, Max, Min, StdDev, Sum, Value, When
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 
 from .forms import *
+from .live_dashboard import session_events
 from .models import *
+from .queries import attendance_report_rows, count_many
+from .quiz_payload import get_quiz_payload
+from .session_snapshot import forget_sessions
 
 
 def staff_home(request):
-    staff = get_object_or_404(Staff, admin=request.user)
-    total_students = Student.objects.filter(course=staff.course).count()
-    total_leave = LeaveReportStaff.objects.filter(staff=staff).count()
-    subjects = Subject.objects.filter(staff=staff)
-    total_subject = subjects.count()
-    attendance_list = Attendance.objects.filter(subject__in=subjects)
-    total_attendance = attendance_list.count()
-    attendance_list = []
-    subject_list = []
-    for subject in subjects:
-        attendance_count = Attendance.objects.filter(subject=subject).count()
-        subject_list.append(subject.name)
-        attendance_list.append(attendance_count)
+    staff = get_object_or_404(Staff.objects.select_related('admin', 'course'), admin=request.user)
+    stats = get_staff_home_stats(staff)
     context = {
         'page_title': 'Staff Panel - ' + str(staff.admin.last_name) + ' (' + str(staff.course) + ')',
-        'total_students': total_students,
-        'total_attendance': total_attendance,
-        'total_leave': total_leave,
-        'total_subject': total_subject,
+        **stats
+    }
+    return render(request, 'staff_template/home_content.html', context)
+
+
+def get_staff_home_stats(staff):
+    """
+    Dashboard numbers for a staff member, computed in two queries whatever the number of subjects.
+    Cached per staff when STAFF_HOME_CACHE_TIMEOUT is set; Attendance, Subject and leave
+    changes for the staff invalidate the entry.
+    """
+    timeout = settings.STAFF_HOME_CACHE_TIMEOUT
+    cache_key = staff_home_cache_key(staff.id)
+    if timeout:
+        stats = cache.get(cache_key)
+        if stats is not None:
+            return stats
+
+    totals = count_many(
+        total_students=Student.objects.filter(course_id=staff.course_id),
+        total_leave=LeaveReportStaff.objects.filter(staff=staff),
+    )
+    subjects = Subject.objects.filter(staff=staff).annotate(
+        attendance_count=Count('attendance')).order_by('id').values_list('name', 'attendance_count')
+    subject_list = []
+    attendance_list = []
+    for name, attendance_count in subjects:
+        subject_list.append(name)
+        attendance_list.append(attendance_count)
+    stats = {
+        'total_students': totals['total_students'],
+        'total_attendance': sum(attendance_list),
+        'total_leave': totals['total_leave'],
+        'total_subject': len(subject_list),
         'subject_list': subject_list,
         'attendance_list': attendance_list
     }
-    return render(request, 'staff_template/home_content.html', context)
+    if timeout:
+        cache.set(cache_key, stats, timeout)
+    return stats
 
 
 def staff_take_attendance(request):
@@ -61,15 +98,11 @@ def get_students(request):
         subject = get_object_or_404(Subject, id=subject_id)
         session = get_object_or_404(Session, id=session_id)
         students = Student.objects.filter(
-            course_id=subject.course.id, session=session)
-        student_data = []
-        for student in students:
-            data = {
-                    "id": student.id,
-                    "name": student.admin.last_name + " " + student.admin.first_name
-                    }
-            student_data.append(data)
-        return JsonResponse(json.dumps(student_data), content_type='application/json', safe=False)
+            course_id=subject.course_id, session=session).order_by(
+            'admin__last_name', 'admin__first_name').values_list('id', 'admin__last_name', 'admin__first_name')
+        student_data = [{"id": student_id, "name": last_name + " " + first_name}
+                        for student_id, last_name, first_name in students]
+        return JsonResponse(student_data, safe=False)
     except Exception as e:
         return e
 
@@ -81,24 +114,25 @@ def save_attendance(request):
     date = request.POST.get('date')
     subject_id = request.POST.get('subject')
     session_id = request.POST.get('session')
-    students = json.loads(student_data)
+    statuses = {int(student_dict.get('id')): bool(int(student_dict.get('status') or 0))
+                for student_dict in json.loads(student_data)}
+    known_ids = set(Student.objects.filter(id__in=statuses).values_list('id', flat=True))
+    unknown_ids = sorted(set(statuses) - known_ids)
+    if unknown_ids:
+        return JsonResponse({'unknown_ids': unknown_ids}, status=400)
     try:
         session = get_object_or_404(Session, id=session_id)
         subject = get_object_or_404(Subject, id=subject_id)
 
-        # Check if an attendance object already exists for the given date and session
-        attendance, created = Attendance.objects.get_or_create(session=session, subject=subject, date=date)
-
-        for student_dict in students:
-            student = get_object_or_404(Student, id=student_dict.get('id'))
-
-            # Check if an attendance report already exists for the student and the attendance object
-            attendance_report, report_created = AttendanceReport.objects.get_or_create(student=student, attendance=attendance)
-
-            # Update the status only if the attendance report was newly created
-            if report_created:
-                attendance_report.status = student_dict.get('status')
-                attendance_report.save()
+        with transaction.atomic():
+            # Upsert on (session, subject, date); the conflicting row stays locked until commit,
+            # so concurrent submissions for the same day are applied one after the other
+            attendance = Attendance(session=session, subject=subject, date=date)
+            Attendance.objects.bulk_create([attendance], update_conflicts=True,
+                                           unique_fields=['session', 'subject', 'date'], update_fields=['updated_at'])
+            save_attendance_reports(attendance, statuses)
+        # bulk_create sends no post_save, so drop the staff dashboard entry here
+        cache.delete(staff_home_cache_key(subject.staff_id))
 
     except Exception as e:
         return None
@@ -106,6 +140,21 @@ def save_attendance(request):
     return HttpResponse("OK")
 
 
+def save_attendance_reports(attendance, statuses):
+    """
+    Creates the missing AttendanceReport rows for an attendance in bulk, from a
+    {student_id: status} map of known students. Existing reports are left
+    untouched, so the query count does not grow with the roster.
+    """
+    existing = set(AttendanceReport.objects.filter(
+        attendance=attendance, student_id__in=statuses).values_list('student_id', flat=True))
+    new_reports = [AttendanceReport(student_id=student_id, attendance=attendance, status=status)
+                   for student_id, status in statuses.items() if student_id not in existing]
+    AttendanceReport.objects.bulk_create(new_reports, ignore_conflicts=True)
+    AttendanceSummary.add_reports(attendance, new_reports)
+    return new_reports
+
+
 def staff_update_attendance(request):
     staff = get_object_or_404(Staff, admin=request.user)
     subjects = Subject.objects.filter(staff_id=staff)
@@ -124,14 +173,7 @@ def get_student_attendance(request):
     attendance_date_id = request.POST.get('attendance_date_id')
     try:
         date = get_object_or_404(Attendance, id=attendance_date_id)
-        attendance_data = AttendanceReport.objects.filter(attendance=date)
-        student_data = []
-        for attendance in attendance_data:
-            data = {"id": attendance.student.admin.id,
-                    "name": attendance.student.admin.last_name + " " + attendance.student.admin.first_name,
-                    "status": attendance.status}
-            student_data.append(data)
-        return JsonResponse(json.dumps(student_data), content_type='application/json', safe=False)
+        return JsonResponse(attendance_report_rows(date), safe=False)
     except Exception as e:
         return e
 
@@ -144,18 +186,42 @@ def update_attendance(request):
     try:
         attendance = get_object_or_404(Attendance, id=date)
 
-        for student_dict in students:
-            student = get_object_or_404(
-                Student, admin_id=student_dict.get('id'))
-            attendance_report = get_object_or_404(AttendanceReport, student=student, attendance=attendance)
-            attendance_report.status = student_dict.get('status')
-            attendance_report.save()
+        with transaction.atomic():
+            unknown_ids = update_attendance_reports(attendance, students)
+        if unknown_ids:
+            return JsonResponse({'unknown_ids': unknown_ids}, status=400)
     except Exception as e:
         return None
 
     return HttpResponse("OK")
 
 
+def update_attendance_reports(attendance, students):
+    """
+    Applies the submitted statuses (keyed by the student's admin id) to the reports of an attendance.
+    Nothing is written when an id has no report; those ids are returned instead.
+    """
+    statuses = {int(student_dict.get('id')): bool(int(student_dict.get('status') or 0))
+                for student_dict in students}
+    reports = {report.admin_id: report for report in AttendanceReport.objects.filter(
+        attendance=attendance, student__admin_id__in=statuses).annotate(
+        admin_id=F('student__admin_id')).only('id', 'student_id', 'status')}
+    unknown_ids = sorted(set(statuses) - set(reports))
+    if unknown_ids:
+        return unknown_ids
+
+    now = timezone.now()
+    changed = []
+    for admin_id, report in reports.items():
+        if report.status != statuses[admin_id]:
+            report.status = statuses[admin_id]
+            report.updated_at = now
+            changed.append(report)
+    AttendanceReport.objects.bulk_update(changed, ['status', 'updated_at'])
+    AttendanceSummary.apply_status_changes(attendance, changed)
+    return []
+
+
 def staff_apply_leave(request):
     form = LeaveReportStaffForm(request.POST or None)
     staff = get_object_or_404(Staff, admin_id=request.user.id)
@@ -425,6 +491,16 @@ def quiz_session_create(request, quiz_id):
     if request.method == "POST":
         form = QuizSessionForm(request.POST)
         if form.is_valid():
+            sections = form.cleaned_data['sections']
+            if sections > 1:
+                # One session per section, inserted together
+                sessions = QuizSession.create_many([
+                    QuizSession(quiz=quiz, created_by=staff,
+                                **{field: form.cleaned_data[field] for field in form.Meta.fields})
+                    for _ in range(sections)])
+                codes = ", ".join(session.session_code for session in sessions)
+                messages.success(request, f"{sections} sessions created with codes {codes}")
+                return redirect("quiz_detail", quiz_id=quiz.id)
             session = form.save(commit=False)
             session.quiz = quiz
             session.created_by = staff
@@ -449,6 +525,44 @@ def session_detail(request, session_id):
     return render(request, "staff_template/session_detail.html", {"session": session, "page title": "Live Session Details"})
 
 
+QR_CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+
+def render_session_qr(session_code, image_format):
+    """Renders the QR code for a session code as PNG or SVG bytes."""
+    buffer = BytesIO()
+    if image_format == 'svg':
+        qrcode.make(session_code, image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+    else:
+        qrcode.make(session_code).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@login_required
+def session_qr(request, session_id):
+    """
+    Serves the QR code for a session, rendered on first request and cached.
+    A session code never changes, so browsers may keep the image and revalidate by ETag.
+    """
+    staff = get_object_or_404(Staff, admin=request.user)
+    session_code = get_object_or_404(
+        QuizSession.objects.values_list('session_code', flat=True), id=session_id, created_by=staff)
+    image_format = 'svg' if request.GET.get('format') == 'svg' else 'png'
+    etag = '"%s-%s"' % (session_code, image_format)
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        cache_key = 'session_qr:%s:%s' % (session_code, image_format)
+        image = cache.get(cache_key)
+        if image is None:
+            image = render_session_qr(session_code, image_format)
+            cache.set(cache_key, image, settings.QR_CODE_CACHE_TIMEOUT)
+        response = HttpResponse(image, content_type=QR_CONTENT_TYPES[image_format])
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=settings.QR_CODE_CACHE_TIMEOUT)
+    return response
+
+
 @login_required
 def quiz_builder(request, quiz_id):
     """
@@ -463,6 +577,8 @@ def quiz_builder(request, quiz_id):
     if request.method == 'POST':
         formset = QuestionFormSet(request.POST)
         if formset.is_valid():
+            questions = []
+            choices = []
             for form in formset:
                 # Extract data from the form
                 question_text = form.cleaned_data.get('text')
@@ -475,13 +591,21 @@ def quiz_builder(request, quiz_id):
                 ]
                 correct_choice_index = int(form.cleaned_data.get('correct_choice')) - 1
 
-                # Create Question and Choice objects in the database
                 if question_text:
-                    question = Question.objects.create(quiz=quiz, text=question_text, marks=marks)
+                    question = Question(quiz=quiz, text=question_text, marks=marks)
+                    questions.append(question)
                     for i, choice_text in enumerate(choices_data):
                         if choice_text:
                             is_correct = (i == correct_choice_index)
-                            Choice.objects.create(question=question, text=choice_text, is_correct=is_correct)
+                            choices.append(Choice(question=question, text=choice_text, is_correct=is_correct))
+
+            # Insert everything in two statements; bulk_create sends no signals,
+            # so refresh the quiz totals (and with them the payload version) here
+            with transaction.atomic():
+                Question.objects.bulk_create(questions)
+                Choice.objects.bulk_create(choices)
+                Quiz.refresh_totals(quiz.id)
+            forget_sessions(quiz.sessions.values_list('id', 'session_code'))
             
             messages.success(request, "Questions added successfully!")
             return redirect('quiz_detail', quiz_id=quiz.id)
@@ -540,17 +664,13 @@ def session_dashboard(request, session_id):
     Displays a rich analysis dashboard for a quiz session, including performance stats and charts.
     """
     staff = get_object_or_404(Staff, admin=request.user)
-    session = get_object_or_404(QuizSession, id=session_id, created_by=staff)
+    session = get_object_or_404(QuizSession.objects.select_related('quiz__subject'), id=session_id, created_by=staff)
     
-    # --- THIS IS THE FIX ---
-    # Calculate total_marks_possible early, as it's always needed.
-    total_marks_possible = sum(q.marks for q in session.quiz.questions.all())
-    
-    # Get all submitted attempts for this session
-    submitted_attempts = session.attempts.filter(status=QuizAttempt.STATUS_SUBMITTED).select_related('student__admin')
+    total_marks_possible = session.quiz.total_marks
+    stats = get_session_dashboard_stats(session)
 
     # Handle the case where there are no submissions yet
-    if not submitted_attempts.exists():
+    if stats is None:
         context = {
             'session': session,
             'page_title': f"Dashboard: {session.quiz.title}",
@@ -560,50 +680,85 @@ def session_dashboard(request, session_id):
         }
         return render(request, 'staff_template/session_dashboard.html', context)
 
-    # --- Calculations for when submissions EXIST ---
-    
-    # Avoid division by zero if a quiz has no marks
-    safe_total_marks = total_marks_possible if total_marks_possible > 0 else 1
+    submitted_attempts = session.attempts.filter(
+        status=QuizAttempt.STATUS_SUBMITTED).select_related('student__admin').order_by('-score', 'id')
+    attempts_page = Paginator(submitted_attempts, SESSION_DASHBOARD_PAGE_SIZE).get_page(request.GET.get('page'))
+
+    context = {
+        'session': session,
+        'page_title': f"Analysis for {session.quiz.title}",
+        'no_submissions': False,
+        'total_marks_possible': total_marks_possible,
+        'student_attempts': attempts_page,
+        **stats
+    }
+    return render(request, 'staff_template/session_dashboard.html', context)
+
+
+@login_required
+async def session_dashboard_stream(request, session_id):
+    """
+    Pushes live submission stats for a quiz session as server-sent events.
+    Needs the ASGI application so the stream does not hold a worker thread.
+    """
+    staff = await aget_object_or_404(Staff, admin=await request.auser())
+    session = await aget_object_or_404(QuizSession.objects.select_related('quiz'), id=session_id, created_by=staff)
+    response = StreamingHttpResponse(session_events(session), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
+
+SESSION_DASHBOARD_PAGE_SIZE = 50
+HISTOGRAM_LABELS = ["0-10%", "10-20%", "20-30%", "30-40%", "40-50%", "50-60%", "60-70%", "70-80%", "80-90%", "90-100%"]
+
+
+def get_session_dashboard_stats(session):
+    """
+    Aggregates for the session dashboard, or None before the first submission.
+    The score histogram is binned by the database; once there are submissions the
+    result is cached for SESSION_DASHBOARD_CACHE_TIMEOUT seconds so concurrent
+    refreshes share one computation.
+    """
+    cache_key = 'session_dashboard:%s' % session.id
+    stats = cache.get(cache_key)
+    if stats is not None:
+        return stats
+
+    submitted_attempts = session.attempts.filter(status=QuizAttempt.STATUS_SUBMITTED)
     performance_stats = submitted_attempts.aggregate(
         avg_score=Avg('score'),
         max_score=Max('score'),
         min_score=Min('score'),
-        std_dev=StdDev('score')
+        std_dev=StdDev('score'),
+        total_students_joined=Count('student', distinct=True)
     )
+    total_students_joined = performance_stats.pop('total_students_joined')
+    if not total_students_joined:
+        # Not cached, so the page built after the first submission already shows it
+        return None
 
-    total_students_in_course = Student.objects.filter(course=session.quiz.subject.course).count()
-    total_students_joined = submitted_attempts.values('student').distinct().count()
+    # Avoid division by zero if a quiz has no marks
+    safe_total_marks = session.quiz.total_marks if session.quiz.total_marks > 0 else 1
+    score_bin = Case(
+        *[When(score__gte=safe_total_marks * index / 10, then=Value(index)) for index in range(9, 0, -1)],
+        default=Value(0), output_field=IntegerField())
+    bins = [0] * 10
+    for row in submitted_attempts.annotate(score_bin=score_bin).values('score_bin').annotate(
+            attempts=Count('id')).order_by():
+        bins[row['score_bin']] = row['attempts']
+
+    total_students_in_course = Student.objects.filter(course_id=session.quiz.subject.course_id).count()
     participation_rate = (total_students_joined / total_students_in_course) * 100 if total_students_in_course > 0 else 0
 
-    score_percentages = [ (attempt.score / safe_total_marks) * 100 for attempt in submitted_attempts ]
-    bins = [0] * 10 
-    for p in score_percentages:
-        index = min(int(p / 10), 9)
-        if p == 0:
-            bins[0] += 1
-        elif index > 0:
-            bins[index] +=1
-        else:
-            bins[0] +=1
-
-    histogram_data = {
-        'labels': ["0-10%", "10-20%", "20-30%", "30-40%", "40-50%", "50-60%", "60-70%", "70-80%", "80-90%", "90-100%"],
-        'data': bins
-    }
-
-    context = {
-        'session': session,
-        'page_title': f"Analysis for {session.quiz.title}",
-        'no_submissions': False,
+    stats = {
         'performance_stats': performance_stats,
-        'total_marks_possible': total_marks_possible,
         'total_students_joined': total_students_joined,
         'participation_rate': participation_rate,
-        'histogram_data': histogram_data,
-        'student_attempts': submitted_attempts.order_by('-score'),
+        'histogram_data': {'labels': HISTOGRAM_LABELS, 'data': bins},
     }
-    return render(request, 'staff_template/session_dashboard.html', context)
+    cache.set(cache_key, stats, settings.SESSION_DASHBOARD_CACHE_TIMEOUT)
+    return stats
 
 @login_required
 def item_analysis(request, session_id):
@@ -611,7 +766,7 @@ def item_analysis(request, session_id):
     Provides a detailed, question-by-question analysis for a quiz session.
     """
     staff = get_object_or_404(Staff, admin=request.user)
-    session = get_object_or_404(QuizSession, id=session_id, created_by=staff)
+    session = get_object_or_404(QuizSession.objects.select_related('quiz'), id=session_id, created_by=staff)
     
     # Get all submitted attempts for this session
     attempts = session.attempts.filter(status=QuizAttempt.STATUS_SUBMITTED)
@@ -620,37 +775,58 @@ def item_analysis(request, session_id):
         messages.warning(request, "There are no student submissions to analyze for this session yet.")
         return redirect('session_dashboard', session_id=session.id)
 
-    questions = session.quiz.questions.prefetch_related('choices').all()
-    
+    payload = get_quiz_payload(session.quiz)
+
+    # One grouped pass over every answer: selections per (question, choice) plus the
+    # sum and sum of squares of the attempt scores, for the discrimination index
+    answer_rows = Answer.objects.filter(
+        attempt__session=session, attempt__status=QuizAttempt.STATUS_SUBMITTED).values(
+        'question', 'selected_choice').annotate(
+        times_selected=Count('id'), score_sum=Sum('attempt__score'),
+        score_squares=Sum(F('attempt__score') * F('attempt__score'))).order_by()
+
+    selections = {}
+    totals = {}
+    for row in answer_rows:
+        selections[(row['question'], row['selected_choice'])] = row['times_selected']
+        is_correct = payload['choice_map'].get(row['selected_choice'], (None, False))[1]
+        stats = totals.setdefault(row['question'], [0, 0, 0.0, 0.0, 0.0])
+        stats[0] += row['times_selected']
+        stats[2] += row['score_sum']
+        stats[3] += row['score_squares']
+        if is_correct:
+            stats[1] += row['times_selected']
+            stats[4] += row['score_sum']
+
     item_analysis_data = []
-    for question in questions:
-        # Get all answers for this specific question from all attempts in this session
-        answers_for_question = Answer.objects.filter(attempt__in=attempts, question=question)
-        total_answers = answers_for_question.count()
+    for question in payload['questions']:
+        total_answers, correct_answers, score_sum, score_squares, correct_score_sum = totals.get(
+            question['id'], (0, 0, 0.0, 0.0, 0.0))
 
         if total_answers > 0:
-            # Calculate how many students answered this question correctly
-            correct_answers = answers_for_question.filter(selected_choice__is_correct=True).count()
             difficulty_percentage = (correct_answers / total_answers) * 100
+            discrimination_index = point_biserial(
+                total_answers, correct_answers, score_sum, score_squares, correct_score_sum)
             
-            # Calculate how many students chose each specific option
+            # How many students chose each specific option
             choice_stats = []
-            for choice in question.choices.all():
-                times_selected = answers_for_question.filter(selected_choice=choice).count()
-                selection_percentage = (times_selected / total_answers) * 100
+            for choice in question['choices']:
+                times_selected = selections.get((question['id'], choice['id']), 0)
                 choice_stats.append({
-                    'text': choice.text,
-                    'is_correct': choice.is_correct,
+                    'text': choice['text'],
+                    'is_correct': payload['choice_map'][choice['id']][1],
                     'times_selected': times_selected,
-                    'selection_percentage': selection_percentage
+                    'selection_percentage': (times_selected / total_answers) * 100
                 })
         else:
             difficulty_percentage = None
+            discrimination_index = None
             choice_stats = []
 
         item_analysis_data.append({
             'question': question,
             'difficulty_percentage': difficulty_percentage,
+            'discrimination_index': discrimination_index,
             'choice_stats': choice_stats
         })
 
@@ -659,4 +835,18 @@ def item_analysis(request, session_id):
         'item_analysis_data': item_analysis_data,
         'page_title': f"Item Analysis for {session.quiz.title}"
     }
-    return render(request, 'staff_template/item_analysis.html', context)
\ No newline at end of file
+    return render(request, 'staff_template/item_analysis.html', context)
+
+
+def point_biserial(n, n_correct, score_sum, score_squares, correct_score_sum):
+    """
+    Point-biserial correlation between answering an item correctly and the attempt score,
+    from the item's answer count, correct count and score sums. None when undefined.
+    """
+    n_wrong = n - n_correct
+    variance = score_squares / n - (score_sum / n) ** 2
+    if n_correct == 0 or n_wrong == 0 or variance <= 1e-12:
+        return None
+    mean_correct = correct_score_sum / n_correct
+    mean_wrong = (score_sum - correct_score_sum) / n_wrong
+    return (mean_correct - mean_wrong) / math.sqrt(variance) * math.sqrt(n_correct * n_wrong / n ** 2)
@@ -1,11 +1,12 @@
 import json
 import math
-import requests
 from datetime import datetime
 
 from django.contrib import messages
 from django.core.files.storage import FileSystemStorage
-from django.http import HttpResponse, JsonResponse
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import (HttpResponseRedirect, get_object_or_404,
                               redirect, render)
 from django.shortcuts import render, redirect, get_object_or_404
@@ -16,7 +17,10 @@ from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 
 from .forms import *
+from .geolocation import locate_attempt_later
 from .models import *
+from .quiz_payload import get_quiz_payload
+from .session_snapshot import get_session_snapshot, get_session_snapshot_by_code
 
 def student_required(view_func):
     @login_required
@@ -29,9 +33,14 @@ def student_required(view_func):
 
 def student_home(request):
     student = get_object_or_404(Student, admin=request.user)
-    total_subject = Subject.objects.filter(course=student.course).count()
-    total_attendance = AttendanceReport.objects.filter(student=student).count()
-    total_present = AttendanceReport.objects.filter(student=student, status=True).count()
+    subjects = list(Subject.objects.filter(course_id=student.course_id))
+    breakdown = {
+        row['subject']: row for row in AttendanceSummary.objects.filter(student=student).values(
+            'subject').annotate(present=Sum('present'), total=Sum('total')).order_by()
+    }
+    total_subject = len(subjects)
+    total_present = sum(row['present'] for row in breakdown.values())
+    total_attendance = sum(row['total'] for row in breakdown.values())
     if total_attendance == 0: 
         percent_absent = percent_present = 0
     else:
@@ -40,16 +49,11 @@ def student_home(request):
     subject_name = []
     data_present = []
     data_absent = []
-    subjects = Subject.objects.filter(course=student.course)
     for subject in subjects:
-        attendance = Attendance.objects.filter(subject=subject)
-        present_count = AttendanceReport.objects.filter(
-            attendance__in=attendance, status=True, student=student).count()
-        absent_count = AttendanceReport.objects.filter(
-            attendance__in=attendance, status=False, student=student).count()
+        row = breakdown.get(subject.id, {'present': 0, 'total': 0})
         subject_name.append(subject.name)
-        data_present.append(present_count)
-        data_absent.append(absent_count)
+        data_present.append(row['present'])
+        data_absent.append(row['total'] - row['present'])
     context = {
         'total_attendance': total_attendance,
         'percent_present': percent_present,
@@ -81,20 +85,23 @@ def student_view_attendance(request):
         end = request.POST.get('end_date')
         try:
             subject = get_object_or_404(Subject, id=subject_id)
-            start_date = datetime.strptime(start, "%Y-%m-%d")
-            end_date = datetime.strptime(end, "%Y-%m-%d")
-            attendance = Attendance.objects.filter(
-                date__range=(start_date, end_date), subject=subject)
+            start_date = datetime.strptime(start, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end, "%Y-%m-%d").date()
             attendance_reports = AttendanceReport.objects.filter(
-                attendance__in=attendance, student=student)
-            json_data = []
-            for report in attendance_reports:
-                data = {
-                    "date":  str(report.attendance.date),
-                    "status": report.status
-                }
-                json_data.append(data)
-            return JsonResponse(json.dumps(json_data), safe=False)
+                student=student, attendance__subject=subject,
+                attendance__date__range=(start_date, end_date)).order_by(
+                'attendance__date').values_list('attendance__date', 'status')
+            if request.POST.get('format') == 'ndjson':
+                # Stream long ranges line by line instead of building the whole list first. The
+                # generator is async: under ASGI a sync one is read into a list before sending
+                async def lines():
+                    # values(): a flat values_list() queryset opens its cursor outside the worker thread
+                    rows = attendance_reports.values('attendance__date', 'status')
+                    async for row in rows.aiterator(chunk_size=500):
+                        yield json.dumps({"date": str(row['attendance__date']), "status": row['status']}) + "\n"
+                return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+            json_data = [{"date": str(date), "status": status} for date, status in attendance_reports]
+            return JsonResponse(json_data, safe=False)
         except Exception as e:
             return None
 
@@ -230,17 +237,14 @@ def student_join_quiz(request):
             messages.error(request, "Please enter a session code.")
             return redirect('student_join_quiz')
 
-        try:
-            quiz_session = QuizSession.objects.get(session_code=session_code)
-            
-            if not quiz_session.is_open_now:
-                messages.error(request, "This quiz session is not currently active or has ended.")
-                return redirect('student_join_quiz')
-                
-            return redirect('quiz_lobby', session_id=quiz_session.id)
-            
-        except QuizSession.DoesNotExist:
+        quiz_session = get_session_snapshot_by_code(session_code)
+        if quiz_session is None:
             messages.error(request, "Invalid session code. Please check the code and try again.")
+        elif not quiz_session.is_open_now:
+            messages.error(request, "This quiz session is not currently active or has ended.")
+            return redirect('student_join_quiz')
+        else:
+            return redirect('quiz_lobby', session_id=quiz_session.id)
 
     return render(request, 'student_template/join_quiz.html', {'page_title': 'Join a Quiz'})
 
@@ -250,18 +254,25 @@ def quiz_lobby(request, session_id):
     Displays quiz details and a 'Start' button before the quiz begins.
     Also checks if the student has already reached their max attempts.
     """
-    session = get_object_or_404(QuizSession, id=session_id)
-    student = get_object_or_404(Student, admin=request.user)
-    
-    existing_attempts = QuizAttempt.objects.filter(session=session, student=student).count()
+    session = get_session_snapshot(session_id)
+    if session is None:
+        raise Http404("No such quiz session")
+
+    statuses = list(QuizAttempt.objects.filter(
+        session_id=session.id, student__admin=request.user).values_list('status', flat=True))
 
-    if existing_attempts >= session.max_attempts_per_student:
+    if QuizAttempt.STATUS_STARTED in statuses:
+        # An unfinished attempt is resumed rather than counted against the limit
+        return redirect('quiz_take', session_id=session.id)
+
+    if len(statuses) >= session.max_attempts_per_student:
         messages.warning(request, "You have already completed the maximum number of attempts for this quiz.")
         return redirect('student_home') 
 
     context = {
         'session': session,
-        'page_title': f"Ready to Start: {session.quiz.title}"
+        'question_count': session.question_count,
+        'page_title': f"Ready to Start: {session.quiz_title}"
     }
     return render(request, 'student_template/quiz_lobby.html', context)
 
@@ -277,74 +288,133 @@ def get_client_ip(request):
         ip = '124.41.204.21' 
     return ip
 
+def start_attempt(session, student):
+    """
+    Returns the student's in-progress attempt for the session, creating one if
+    they have attempts left, or None once max_attempts_per_student is used up.
+    """
+    attempts = QuizAttempt.objects.filter(session=session, student=student)
+    attempt = attempts.filter(status=QuizAttempt.STATUS_STARTED).first()
+    if attempt is not None:
+        return attempt
+    attempt_count = attempts.count()
+    if attempt_count >= session.max_attempts_per_student:
+        return None
+    try:
+        with transaction.atomic():
+            return QuizAttempt.objects.create(session=session, student=student, attempt_no=attempt_count + 1)
+    except IntegrityError:
+        # Another request (e.g. a second tab) started the same attempt first
+        return attempts.filter(status=QuizAttempt.STATUS_STARTED).first()
+
+
+def graded_answers(submitted, payload):
+    """
+    Turns {question_id: choice_id} pairs into unsaved Answer rows, dropping
+    unknown questions and choices that belong to a different question.
+    """
+    choice_map = payload['choice_map']
+    question_ids = {question['id'] for question in payload['questions']}
+    answers = []
+    for question_id, choice_id in submitted.items():
+        if not str(question_id).isdigit() or not str(choice_id).isdigit():
+            continue
+        if int(question_id) not in question_ids:
+            continue
+        if choice_map.get(int(choice_id), (None, False))[0] != int(question_id):
+            continue
+        answers.append(Answer(question_id=int(question_id), selected_choice_id=int(choice_id)))
+    return answers
+
+
+def save_answers(attempt, answers):
+    """Upserts the attempt's answers; a question answered again keeps only the latest choice."""
+    for answer in answers:
+        answer.attempt = attempt
+    Answer.objects.bulk_create(answers, update_conflicts=True, unique_fields=['attempt', 'question'],
+                               update_fields=['selected_choice'])
+
+
 @student_required
 def quiz_take(request, session_id):
     """
     Handles the main quiz-taking process, displaying questions and processing answers.
+    The attempt is created when the quiz is opened and answers are autosaved while
+    the student works, so the final submit only has to score what is stored.
     """
-    session = get_object_or_404(QuizSession, id=session_id)
+    session = get_object_or_404(QuizSession.objects.select_related('quiz'), id=session_id)
     student = get_object_or_404(Student, admin=request.user)
     
-    questions = session.quiz.questions.prefetch_related('choices').all()
+    if not session.is_open_now:
+        messages.error(request, "This quiz session is not currently active or has ended.")
+        return redirect('student_join_quiz')
+
+    payload = get_quiz_payload(session.quiz)
+    attempt = start_attempt(session, student)
+    if attempt is None:
+        messages.warning(request, "You have already completed the maximum number of attempts for this quiz.")
+        return redirect('student_home')
 
     if request.method == 'POST':
-        latitude, longitude = None, None
-        try:
-            ip_address = get_client_ip(request)
-            
-            response = requests.get(f'https://ipapi.co/{ip_address}/json/', timeout=5)
-            response.raise_for_status() 
-            
-            data = response.json()
-            if not data.get('error'):
-                latitude = data.get('latitude')
-                longitude = data.get('longitude')
-                print(f"Location found for IP {ip_address}: {latitude}, {longitude}")
-        except Exception as e:
-            print(f"Could not get location via IP address. Error: {e}")
-        
-        attempt = QuizAttempt.objects.create(
-            session=session,
-            student=student,
-            status=QuizAttempt.STATUS_STARTED,
-            attempt_no=QuizAttempt.objects.filter(session=session, student=student).count() + 1,
-            latitude=latitude,
-            longitude=longitude
-        )
-        
-        total_score = 0
-        for question in questions:
-            submitted_choice_id = request.POST.get(f'question_{question.id}')
-            if submitted_choice_id:
-                selected_choice = get_object_or_404(Choice, id=submitted_choice_id)
-                Answer.objects.create(attempt=attempt, question=question, selected_choice=selected_choice)
-                if selected_choice.is_correct:
-                    total_score += question.marks
-        
-        attempt.score = total_score
-        attempt.status = QuizAttempt.STATUS_SUBMITTED
-        attempt.submitted_at = timezone.now()
-        attempt.save()
+        submitted = {key[len('question_'):]: value for key, value in request.POST.items()
+                     if key.startswith('question_')}
+        with transaction.atomic():
+            # Anything answered since the last autosave
+            save_answers(attempt, graded_answers(submitted, payload))
+            marks = {question['id']: question['marks'] for question in payload['questions']}
+            total_score = 0
+            for question_id, choice_id in attempt.answers.values_list('question_id', 'selected_choice_id'):
+                if payload['choice_map'].get(choice_id, (None, False))[1]:
+                    total_score += marks.get(question_id, 0)
+            submitted_now = QuizAttempt.objects.filter(id=attempt.id, status=QuizAttempt.STATUS_STARTED).update(
+                status=QuizAttempt.STATUS_SUBMITTED, score=total_score, submitted_at=timezone.now())
+            if submitted_now:
+                locate_attempt_later(attempt.id, get_client_ip(request))
 
         return redirect('quiz_result', attempt_id=attempt.id)
 
     context = {
         'session': session,
-        'questions': questions,
+        'attempt': attempt,
+        'saved_answers': {question_id: choice_id for question_id, choice_id in
+                          attempt.answers.values_list('question_id', 'selected_choice_id')},
+        'questions_html': payload['questions_html'],
         'page_title': f"Taking Quiz: {session.quiz.title}"
     }
     return render(request, 'student_template/quiz_take.html', context)
 
 
+@student_required
+def quiz_autosave(request, attempt_id):
+    """
+    Stores a batch of in-progress answers, posted as JSON {"answers": {question_id: choice_id}}.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    attempt = get_object_or_404(QuizAttempt.objects.select_related('session__quiz'), id=attempt_id,
+                                student__admin=request.user, status=QuizAttempt.STATUS_STARTED)
+    try:
+        submitted = json.loads(request.body)['answers']
+        if not isinstance(submitted, dict):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected {"answers": {question_id: choice_id}}'}, status=400)
+    if not attempt.session.is_open_now:
+        return JsonResponse({'error': "This quiz session is not currently active or has ended."}, status=403)
+    answers = graded_answers(submitted, get_quiz_payload(attempt.session.quiz))
+    save_answers(attempt, answers)
+    return JsonResponse({'saved': len(answers)})
+
+
 @student_required
 def quiz_result(request, attempt_id):
     """
     Displays the final score to the student immediately after they submit their quiz.
     """
     student = get_object_or_404(Student, admin=request.user)
-    attempt = get_object_or_404(QuizAttempt, id=attempt_id, student=student)
+    attempt = get_object_or_404(QuizAttempt.objects.select_related('session__quiz'), id=attempt_id, student=student)
 
-    total_marks_possible = sum(q.marks for q in attempt.session.quiz.questions.all())
+    total_marks_possible = attempt.session.quiz.total_marks
 
     context = {
         'attempt': attempt,
@@ -1,3 +1,1029 @@
-from django.test import TestCase
+import json
+import statistics
+import tempfile
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import geolocation, http_client, session_snapshot, staff_views
+from .live_dashboard import SessionAccumulator
+from .models import *
+
+
+class AttendanceTestMixin:
+    """Builds a course with one staff member, one subject and a roster of students."""
+
+    def make_user(self, user_type, email, first_name="Test", last_name="User"):
+        return CustomUser.objects.create_user(
+            email=email, password=None, user_type=user_type,
+            first_name=first_name, last_name=last_name, gender="M", address="-")
+
+    def make_students(self, count, start=0):
+        students = []
+        for i in range(start, start + count):
+            user = self.make_user(3, "student%d@test.com" % i, first_name="S%d" % i, last_name="Student")
+            user.student.course = self.course
+            user.student.session = self.session
+            user.student.save()
+            students.append(user.student)
+        return students
+
+    def setUp(self):
+        self.course = Course.objects.create(name="Computer Science")
+        self.session = Session.objects.create(start_year=date(2026, 1, 1), end_year=date(2026, 12, 31))
+        self.staff_user = self.make_user(2, "staff@test.com", first_name="Ada", last_name="Lovelace")
+        self.staff = self.staff_user.staff
+        self.staff.course = self.course
+        self.staff.save()
+        self.subject = Subject.objects.create(name="Algorithms", staff=self.staff, course=self.course)
+
+
+class SaveAttendanceTest(AttendanceTestMixin, TestCase):
+
+    def post_attendance(self, students, attendance_date="2026-03-02"):
+        return self.client.post(reverse('save_attendance'), {
+            'student_ids': json.dumps([{'id': s.id, 'status': i % 2} for i, s in enumerate(students)]),
+            'date': attendance_date,
+            'subject': self.subject.id,
+            'session': self.session.id,
+        })
+
+    def test_creates_reports_with_status(self):
+        students = self.make_students(4)
+        response = self.post_attendance(students)
+        self.assertEqual(response.content, b"OK")
+        reports = AttendanceReport.objects.filter(attendance__date="2026-03-02")
+        self.assertEqual(reports.count(), 4)
+        self.assertEqual(reports.filter(status=True).count(), 2)
+
+    def test_resubmit_keeps_existing_reports(self):
+        students = self.make_students(3)
+        self.post_attendance(students)
+        self.post_attendance(list(reversed(students)))
+        self.assertEqual(AttendanceReport.objects.count(), 3)
+        self.assertFalse(AttendanceReport.objects.get(student=students[0]).status)
+
+    def test_query_count_is_constant_in_roster_size(self):
+        """Benchmark: 10 and 150 students take the same number of queries."""
+        small = self.make_students(10)
+        large = self.make_students(150, start=10)
+        with self.assertNumQueries(11):
+            self.post_attendance(small, attendance_date="2026-03-02")
+        with self.assertNumQueries(11):
+            self.post_attendance(large, attendance_date="2026-03-03")
+        self.assertEqual(AttendanceReport.objects.count(), 160)
+
+    def test_unknown_student_ids_are_rejected(self):
+        students = self.make_students(2)
+        response = self.client.post(reverse('save_attendance'), {
+            'student_ids': json.dumps([{'id': students[0].id, 'status': 1}, {'id': 9999, 'status': 1}]),
+            'date': "2026-03-02",
+            'subject': self.subject.id,
+            'session': self.session.id,
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'unknown_ids': [9999]})
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_duplicate_day_and_report_are_rejected(self):
+        student = self.make_students(1)[0]
+        attendance = Attendance.objects.create(session=self.session, subject=self.subject, date="2026-03-02")
+        AttendanceReport.objects.create(student=student, attendance=attendance)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Attendance.objects.create(session=self.session, subject=self.subject, date="2026-03-02")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            AttendanceReport.objects.create(student=student, attendance=attendance)
+
+
+class UpdateAttendanceTest(AttendanceTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.students = self.make_students(5)
+        self.attendance = Attendance.objects.create(session=self.session, subject=self.subject, date="2026-03-02")
+        AttendanceReport.objects.bulk_create(
+            [AttendanceReport(student=s, attendance=self.attendance, status=False) for s in self.students])
+
+    def post_update(self, payload):
+        return self.client.post(reverse('update_attendance'), {
+            'student_ids': json.dumps(payload),
+            'date': self.attendance.id,
+        })
+
+    def test_updates_statuses_in_one_write(self):
+        payload = [{'id': s.admin_id, 'status': 1} for s in self.students]
+        with self.assertNumQueries(6):
+            response = self.post_update(payload)
+        self.assertEqual(response.content, b"OK")
+        self.assertEqual(AttendanceReport.objects.filter(status=True).count(), 5)
+
+    def test_unknown_ids_are_reported_and_nothing_is_written(self):
+        payload = [{'id': s.admin_id, 'status': 1} for s in self.students] + [{'id': 9999, 'status': 1}]
+        response = self.post_update(payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'unknown_ids': [9999]})
+        self.assertFalse(AttendanceReport.objects.filter(status=True).exists())
+
+
+class AdminHomeTest(AttendanceTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.make_user(1, "hod@test.com"))
+
+    def add_subjects(self, count):
+        for i in range(count):
+            subject = Subject.objects.create(name="Subject %d" % i, staff=self.staff, course=self.course)
+            Attendance.objects.create(session=self.session, subject=subject, date="2026-03-02")
+
+    def test_query_count_is_fixed(self):
+        self.make_students(3)
+        self.add_subjects(2)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('admin_home'))
+        self.add_subjects(40)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('admin_home'))
+        self.assertEqual(response.context['total_students'], 3)
+        self.assertEqual(response.context['total_staff'], 1)
+        self.assertEqual(response.context['total_course'], 1)
+        self.assertEqual(response.context['total_subject'], 43)
+        self.assertEqual(response.context['attendance_list'], [0] + [1] * 42)
+
+
+class StudentHomeTest(AttendanceTestMixin, TestCase):
+
+    def test_breakdown_per_subject(self):
+        student = self.make_students(1)[0]
+        empty_subject = Subject.objects.create(name="Databases", staff=self.staff, course=self.course)
+        for day, status in ((2, True), (3, True), (4, False)):
+            attendance = Attendance.objects.create(session=self.session, subject=self.subject, date="2026-03-%02d" % day)
+            AttendanceReport.objects.create(student=student, attendance=attendance, status=status)
+        call_command('rebuild_attendance_summary', stdout=StringIO())
+        self.client.force_login(student.admin)
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('student_home'))
+        self.assertEqual(response.context['data_name'], ["Algorithms", "Databases"])
+        self.assertEqual(response.context['data_present'], [2, 0])
+        self.assertEqual(response.context['data_absent'], [1, 0])
+        self.assertEqual(response.context['total_attendance'], 3)
+        self.assertEqual(response.context['percent_present'], 66)
+
+
+class StaffHomeTest(AttendanceTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client.force_login(self.staff_user)
+
+    def add_subject_with_attendance(self, name):
+        subject = Subject.objects.create(name=name, staff=self.staff, course=self.course)
+        Attendance.objects.create(session=self.session, subject=subject, date="2026-03-02")
+
+    def test_query_count_does_not_depend_on_subjects(self):
+        self.make_students(2)
+        with self.assertNumQueries(5):
+            self.client.get(reverse('staff_home'))
+        for i in range(20):
+            self.add_subject_with_attendance("Subject %d" % i)
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('staff_home'))
+        self.assertEqual(response.context['total_students'], 2)
+        self.assertEqual(response.context['total_subject'], 21)
+        self.assertEqual(response.context['total_attendance'], 20)
+
+    @override_settings(STAFF_HOME_CACHE_TIMEOUT=60)
+    def test_cache_is_invalidated_by_attendance_changes(self):
+        self.client.get(reverse('staff_home'))
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('staff_home'))
+        self.assertEqual(response.context['total_attendance'], 0)
+        Attendance.objects.create(session=self.session, subject=self.subject, date="2026-03-02")
+        response = self.client.get(reverse('staff_home'))
+        self.assertEqual(response.context['total_attendance'], 1)
+
+    @override_settings(STAFF_HOME_CACHE_TIMEOUT=60)
+    def test_reassigning_a_subject_invalidates_both_staff(self):
+        self.assertEqual(self.client.get(reverse('staff_home')).context['total_subject'], 1)
+        other_staff = self.make_user(2, "other@test.com").staff
+        self.subject.staff = other_staff
+        self.subject.save()
+        self.assertEqual(self.client.get(reverse('staff_home')).context['total_subject'], 0)
+
+
+class AttendanceSummaryTest(AttendanceTestMixin, TestCase):
+
+    def summary(self):
+        return sorted(AttendanceSummary.objects.values_list('student_id', 'present', 'total'))
+
+    def assertMatchesRebuild(self):
+        incremental = self.summary()
+        AttendanceSummary.rebuild()
+        self.assertEqual(incremental, self.summary())
+
+    def test_write_paths_keep_summary_in_step(self):
+        students = self.make_students(3)
+        for day in ("2026-03-02", "2026-03-03"):
+            self.client.post(reverse('save_attendance'), {
+                'student_ids': json.dumps([{'id': s.id, 'status': int(s == students[0])} for s in students]),
+                'date': day, 'subject': self.subject.id, 'session': self.session.id,
+            })
+        self.assertEqual(self.summary(), [(students[0].id, 2, 2), (students[1].id, 0, 2), (students[2].id, 0, 2)])
+
+        attendance = Attendance.objects.get(date="2026-03-03")
+        self.client.post(reverse('update_attendance'), {
+            'student_ids': json.dumps([{'id': s.admin_id, 'status': int(s != students[0])} for s in students]),
+            'date': attendance.id,
+        })
+        self.assertEqual(self.summary(), [(students[0].id, 1, 2), (students[1].id, 1, 2), (students[2].id, 1, 2)])
+        self.assertMatchesRebuild()
+
+        # The reports go in one DELETE and the summary in two UPDATEs, whatever the roster size
+        with CaptureQueriesContext(connection) as queries:
+            attendance.delete()
+        report_queries = [query['sql'] for query in queries if query['sql'].startswith(
+            ('SELECT "main_app_attendancereport"', 'DELETE FROM "main_app_attendancereport"'))]
+        self.assertEqual(len(report_queries), 1)
+        self.assertEqual(self.summary(), [(students[0].id, 1, 1), (students[1].id, 0, 1), (students[2].id, 0, 1)])
+        self.assertMatchesRebuild()
+
+
+class GetStudentsTest(AttendanceTestMixin, TestCase):
+
+    def test_roster_is_one_query_and_plain_json(self):
+        students = self.make_students(30)
+        with self.assertNumQueries(3):
+            response = self.client.post(reverse('get_students'), {'subject': self.subject.id, 'session': self.session.id})
+        data = response.json()
+        self.assertEqual(len(data), 30)
+        self.assertEqual(data[0], {"id": students[0].id, "name": "Student S0"})
+        self.assertEqual([row['name'] for row in data], sorted(row['name'] for row in data))
+
+
+class AttendanceFetchTest(AttendanceTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.students = self.make_students(20)
+        self.attendance = Attendance.objects.create(session=self.session, subject=self.subject, date="2026-03-02")
+        AttendanceReport.objects.bulk_create(
+            [AttendanceReport(student=s, attendance=self.attendance, status=i < 5) for i, s in enumerate(self.students)])
+
+    def test_staff_endpoint_uses_one_joined_query(self):
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('get_student_attendance'), {'attendance_date_id': self.attendance.id})
+        data = response.json()
+        self.assertEqual(len(data), 20)
+        self.assertEqual(data[0], {"id": self.students[0].admin_id, "name": "Student S0", "status": True})
+
+    def test_admin_endpoint_uses_one_joined_query(self):
+        with self.assertNumQueries(4):
+            response = self.client.post(reverse('get_admin_attendance'), {
+                'attendance_date_id': self.attendance.id, 'session': self.session.id, 'subject': self.subject.id})
+        self.assertEqual(sum(row['status'] for row in response.json()), 5)
+
+
+class StudentAttendanceHistoryTest(AttendanceTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.student = self.make_students(1)[0]
+        for day in range(1, 11):
+            attendance = Attendance.objects.create(session=self.session, subject=self.subject, date="2026-03-%02d" % day)
+            AttendanceReport.objects.create(student=self.student, attendance=attendance, status=day % 2 == 0)
+        self.client.force_login(self.student.admin)
+        self.params = {'subject': self.subject.id, 'start_date': "2026-03-03", 'end_date': "2026-03-06"}
+
+    def test_history_is_one_joined_query(self):
+        with self.assertNumQueries(5):
+            response = self.client.post(reverse('student_view_attendance'), self.params)
+        self.assertEqual(response.json(), [
+            {"date": "2026-03-03", "status": False}, {"date": "2026-03-04", "status": True},
+            {"date": "2026-03-05", "status": False}, {"date": "2026-03-06", "status": True},
+        ])
+
+    async def test_history_can_stream_ndjson(self):
+        await self.async_client.aforce_login(self.student.admin)
+        response = await self.async_client.post(reverse('student_view_attendance'), dict(self.params, format='ndjson'))
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertTrue(response.is_async)
+        lines = b"".join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual([json.loads(line)["date"] for line in lines],
+                         ["2026-03-03", "2026-03-04", "2026-03-05", "2026-03-06"])
+
+
+class QuizTestMixin(AttendanceTestMixin):
+    """Adds a quiz with single-choice questions (first choice correct) and an open session."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        session_snapshot._local.clear()
+        self.quiz = Quiz.objects.create(subject=self.subject, title="Sorting", created_by=self.staff)
+        self.quiz_session = QuizSession.objects.create(quiz=self.quiz, created_by=self.staff)
+
+    def add_questions(self, count, marks=2.0):
+        questions = []
+        for i in range(count):
+            question = Question.objects.create(quiz=self.quiz, text="Question %d" % i, marks=marks, order=i)
+            Choice.objects.bulk_create([Choice(question=question, text="Option %d" % j, is_correct=j == 0)
+                                        for j in range(4)])
+            questions.append(question)
+        return questions
+
+    def answer_form(self, questions, correct):
+        """Picks the correct choice for the first `correct` questions and a wrong one for the rest."""
+        form = {}
+        for i, question in enumerate(questions):
+            choices = sorted(question.choices.values_list('id', flat=True))
+            form['question_%d' % question.id] = choices[0] if i < correct else choices[1]
+        return form
+
+
+class QuizTakeTest(QuizTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.student = self.make_students(1)[0]
+        self.client.force_login(self.student.admin)
+
+    def submit(self, form):
+        return self.client.post(reverse('quiz_take', args=[self.quiz_session.id]), form)
+
+    def test_grading_and_answers(self):
+        questions = self.add_questions(5)
+        response = self.submit(self.answer_form(questions, correct=3))
+        attempt = QuizAttempt.objects.get()
+        self.assertRedirects(response, reverse('quiz_result', args=[attempt.id]), fetch_redirect_response=False)
+        self.assertEqual(attempt.status, QuizAttempt.STATUS_SUBMITTED)
+        self.assertEqual(attempt.score, 6.0)
+        self.assertEqual(attempt.answers.count(), 5)
+
+    def test_choice_from_another_question_is_ignored(self):
+        questions = self.add_questions(2)
+        form = self.answer_form(questions, correct=2)
+        form['question_%d' % questions[0].id] = form['question_%d' % questions[1].id]
+        self.submit(form)
+        attempt = QuizAttempt.objects.get()
+        self.assertEqual(attempt.score, 2.0)
+        self.assertEqual(list(attempt.answers.values_list('question_id', flat=True)), [questions[1].id])
+
+    def test_questions_are_served_from_compiled_payload(self):
+        questions = self.add_questions(3)
+        url = reverse('quiz_take', args=[self.quiz_session.id])
+        self.client.get(url)
+        # Session, student, the in-progress attempt and its saved answers
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertContains(response, 'name="question_%d"' % questions[2].id)
+        choice = questions[0].choices.first()
+        choice.text = "Edited option"
+        choice.save()
+        self.assertContains(self.client.get(url), "Edited option")
+
+    def test_payload_key_follows_quiz_version(self):
+        questions = self.add_questions(2)
+        self.quiz.refresh_from_db()
+        stale_key = quiz_payload_cache_key(self.quiz)
+        self.client.get(reverse('quiz_take', args=[self.quiz_session.id]))
+        self.assertIsNotNone(cache.get(stale_key))
+        # Nothing deletes the old entry, as in any worker other than the editing one;
+        # the edit moves the quiz version so the stale copy is simply never read
+        Choice.objects.filter(question=questions[0]).update(is_correct=False)
+        choice = questions[0].choices.order_by('id').last()
+        choice.is_correct = True
+        choice.save()
+        self.quiz.refresh_from_db()
+        self.assertNotEqual(quiz_payload_cache_key(self.quiz), stale_key)
+        self.submit({'question_%d' % questions[0].id: choice.id})
+        self.assertEqual(QuizAttempt.objects.get().score, 2.0)
+
+    def test_query_count_does_not_depend_on_question_count(self):
+        few = self.add_questions(3)
+        form = self.answer_form(few, correct=3)
+        with self.assertNumQueries(16):
+            self.submit(form)
+        QuizAttempt.objects.all().delete()
+        form = self.answer_form(few + self.add_questions(30), correct=10)
+        with self.assertNumQueries(16):
+            self.submit(form)
+
+    def autosave(self, attempt, answers):
+        return self.client.post(reverse('quiz_autosave', args=[attempt.id]), json.dumps({'answers': answers}),
+                                content_type='application/json')
+
+    def test_autosaved_answers_are_scored_on_submit(self):
+        questions = self.add_questions(4)
+        right = self.answer_form(questions, correct=4)
+        wrong = self.answer_form(questions, correct=0)
+        response = self.client.get(reverse('quiz_take', args=[self.quiz_session.id]))
+        attempt = response.context['attempt']
+        self.assertEqual(attempt.status, QuizAttempt.STATUS_STARTED)
+        first, second, third = ['question_%d' % q.id for q in questions[:3]]
+        self.assertEqual(self.autosave(attempt, {questions[0].id: wrong[first], questions[1].id: right[second]}).json(),
+                         {'saved': 2})
+        # Changing an answer overwrites it; a choice from another question is dropped
+        self.assertEqual(self.autosave(attempt, {questions[0].id: right[first], questions[2].id: right[second]}).json(),
+                         {'saved': 1})
+        self.assertEqual(attempt.answers.count(), 2)
+        response = self.client.get(reverse('quiz_take', args=[self.quiz_session.id]))
+        self.assertEqual(response.context['attempt'], attempt)
+        self.assertEqual(response.context['saved_answers'][questions[0].id], right[first])
+
+        # The final submit only carries the last question
+        last = 'question_%d' % questions[3].id
+        self.submit({last: right[last]})
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, QuizAttempt.STATUS_SUBMITTED)
+        self.assertEqual(attempt.score, 6.0)
+        self.assertEqual(QuizAttempt.objects.count(), 1)
+        self.assertEqual(self.autosave(attempt, {questions[0].id: wrong[first]}).status_code, 404)
+
+    def test_closed_session_starts_no_attempt(self):
+        questions = self.add_questions(1)
+        url = reverse('quiz_take', args=[self.quiz_session.id])
+        attempt = self.client.get(url).context['attempt']
+        self.quiz_session.is_active = False
+        self.quiz_session.save()
+        self.assertEqual(self.autosave(attempt, {questions[0].id: questions[0].choices.first().id}).status_code, 403)
+        self.assertFalse(attempt.answers.exists())
+        attempt.delete()
+        self.assertRedirects(self.client.get(url), reverse('student_join_quiz'), fetch_redirect_response=False)
+        self.assertFalse(QuizAttempt.objects.exists())
+
+
+def fake_resolver(ip_address):
+    fake_resolver.calls.append(ip_address)
+    return (6.5, 3.4) if ip_address.startswith("41.") else None
+
+
+@override_settings(GEOLOCATION_EAGER=True, GEOLOCATION_RESOLVER='main_app.tests.fake_resolver')
+class QuizAttemptGeolocationTest(QuizTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        fake_resolver.calls = []
+        self.questions = self.add_questions(2)
+        self.students = self.make_students(2)
+
+    def submit(self, student, ip_address):
+        self.client.force_login(student.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('quiz_take', args=[self.quiz_session.id]),
+                             self.answer_form(self.questions, correct=1), REMOTE_ADDR=ip_address)
+        return QuizAttempt.objects.get(student=student)
+
+    def test_location_is_filled_after_commit_and_cached_per_ip(self):
+        first = self.submit(self.students[0], "41.1.1.1")
+        second = self.submit(self.students[1], "41.1.1.1")
+        self.assertEqual((first.latitude, first.longitude), (6.5, 3.4))
+        self.assertEqual((second.latitude, second.longitude), (6.5, 3.4))
+        self.assertEqual(fake_resolver.calls, ["41.1.1.1"])
+
+    def test_unresolvable_ip_leaves_location_empty(self):
+        attempt = self.submit(self.students[0], "10.0.0.1")
+        self.submit(self.students[1], "10.0.0.1")
+        self.assertIsNone(attempt.latitude)
+        self.assertEqual(fake_resolver.calls, ["10.0.0.1"])
+
+
+class LocalGeolocationTest(TestCase):
+    ranges = "41.0.0.0,41.0.255.255,6.5,3.5\n102.88.0.0,102.88.255.255,9.0,7.5\n2c0f:f000::,2c0f:f000::ffff,1.5,2.5\n"
+
+    def setUp(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.csv_path = directory + "/ranges.csv"
+        self.bin_path = directory + "/ranges.bin"
+        with open(self.csv_path, "w") as f:
+            f.write(self.ranges)
+
+    def test_csv_table(self):
+        with self.settings(GEOLOCATION_DATABASE=self.csv_path, GEOLOCATION_FALLBACK_RESOLVER=''):
+            self.assertEqual(geolocation.local_lookup("41.0.3.4"), (6.5, 3.5))
+            self.assertEqual(geolocation.local_lookup("2c0f:f000::1"), (1.5, 2.5))
+            self.assertIsNone(geolocation.local_lookup("41.1.0.0"))
+            # IPv6 addresses whose integer value falls in an IPv4 range are not matched
+            self.assertIsNone(geolocation.local_lookup("::2900:304"))
+            self.assertEqual(geolocation.local_lookup("::ffff:41.0.3.4"), (6.5, 3.5))
+
+    def test_mapped_table_and_fallback(self):
+        call_command('build_geoip_database', self.csv_path, self.bin_path, stdout=StringIO())
+        with self.settings(GEOLOCATION_DATABASE=self.bin_path,
+                           GEOLOCATION_FALLBACK_RESOLVER='main_app.tests.fake_resolver'):
+            fake_resolver.calls = []
+            self.assertEqual(geolocation.local_lookup("102.88.200.1"), (9.0, 7.5))
+            self.assertIsNone(geolocation.local_lookup("8.8.8.8"))
+            self.assertIsNone(geolocation.local_lookup("::2900:304"))
+            self.assertEqual(fake_resolver.calls, ["8.8.8.8", "::2900:304"])
+
+    def test_empty_mapped_table(self):
+        open(self.bin_path, "wb").close()
+        with self.settings(GEOLOCATION_DATABASE=self.bin_path, GEOLOCATION_FALLBACK_RESOLVER=''):
+            self.assertIsNone(geolocation.local_lookup("41.0.3.4"))
+
+
+class QuizTotalsTest(QuizTestMixin, TestCase):
+
+    def assertTotals(self, total_marks, question_count):
+        self.quiz.refresh_from_db()
+        self.assertEqual((self.quiz.total_marks, self.quiz.question_count), (total_marks, question_count))
+
+    def test_question_hooks_keep_totals(self):
+        questions = self.add_questions(3, marks=2.0)
+        self.assertTotals(6.0, 3)
+        questions[0].marks = 5.0
+        questions[0].save()
+        self.assertTotals(9.0, 3)
+        questions[1].delete()
+        self.assertTotals(7.0, 2)
+
+    def test_quiz_builder_bulk_insert_updates_totals(self):
+        self.client.force_login(self.staff_user)
+        form = {'form-TOTAL_FORMS': '2', 'form-INITIAL_FORMS': '0'}
+        for i in range(2):
+            form.update({'form-%d-text' % i: "Q%d" % i, 'form-%d-marks' % i: '1.5', 'form-%d-choice_1' % i: "a",
+                         'form-%d-choice_2' % i: "b", 'form-%d-correct_choice' % i: '2'})
+        self.client.post(reverse('quiz_builder', args=[self.quiz.id]), form)
+        self.assertTotals(3.0, 2)
+        self.assertEqual(Choice.objects.filter(question__quiz=self.quiz, is_correct=True).count(), 2)
+
+    def test_result_page_does_not_load_questions(self):
+        self.add_questions(4)
+        student = self.make_students(1)[0]
+        attempt = QuizAttempt.objects.create(session=self.quiz_session, student=student, score=4.0,
+                                             status=QuizAttempt.STATUS_SUBMITTED)
+        self.client.force_login(student.admin)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('quiz_result', args=[attempt.id]))
+        self.assertEqual(response.context['total_marks_possible'], 8.0)
+
+
+class ItemAnalysisTest(QuizTestMixin, TestCase):
+
+    def submit_attempts(self, questions, correct_counts):
+        """One submitted attempt per entry, answering the first n questions correctly."""
+        for i, correct in enumerate(correct_counts):
+            student = self.make_students(1, start=len(questions) * 100 + i)[0]
+            attempt = QuizAttempt.objects.create(session=self.quiz_session, student=student, score=correct * 2.0,
+                                                 status=QuizAttempt.STATUS_SUBMITTED)
+            form = self.answer_form(questions, correct)
+            Answer.objects.bulk_create([Answer(attempt=attempt, question=q, selected_choice_id=form['question_%d' % q.id])
+                                        for q in questions])
+
+    def get_analysis(self):
+        return self.client.get(reverse('item_analysis', args=[self.quiz_session.id]))
+
+    def test_statistics(self):
+        self.client.force_login(self.staff_user)
+        questions = self.add_questions(3)
+        self.submit_attempts(questions, [0, 1, 2, 3])
+        items = self.get_analysis().context['item_analysis_data']
+        self.assertEqual([item['difficulty_percentage'] for item in items], [75.0, 50.0, 25.0])
+        self.assertEqual([choice['times_selected'] for choice in items[0]['choice_stats']], [3, 1, 0, 0])
+        # Scores 0, 2, 4, 6: the first question is right for the top three attempts
+        self.assertAlmostEqual(items[0]['discrimination_index'], 0.7745966, places=6)
+        self.assertTrue(all(item['discrimination_index'] > 0 for item in items))
+
+    def test_query_count_does_not_depend_on_question_count(self):
+        self.client.force_login(self.staff_user)
+        self.submit_attempts(self.add_questions(2), [1, 2])
+        self.get_analysis()
+        with self.assertNumQueries(6):
+            self.get_analysis()
+        self.add_questions(20)
+        self.get_analysis()
+        with self.assertNumQueries(6):
+            self.get_analysis()
+
+
+class SessionDashboardTest(QuizTestMixin, TestCase):
+
+    def get_dashboard(self, **params):
+        return self.client.get(reverse('session_dashboard', args=[self.quiz_session.id]), params)
+
+    def submit_scores(self, scores):
+        students = self.make_students(len(scores))
+        QuizAttempt.objects.bulk_create([
+            QuizAttempt(session=self.quiz_session, student=student, score=score, status=QuizAttempt.STATUS_SUBMITTED)
+            for student, score in zip(students, scores)])
+
+    def test_histogram_is_binned_by_percentage(self):
+        self.client.force_login(self.staff_user)
+        self.add_questions(5)
+        self.submit_scores([0, 2.5, 10, 9.5, 5, 0.9])
+        response = self.get_dashboard()
+        self.assertEqual(response.context['histogram_data']['data'], [2, 0, 1, 0, 0, 1, 0, 0, 0, 2])
+        self.assertEqual(response.context['total_students_joined'], 6)
+        self.assertEqual(response.context['performance_stats']['max_score'], 10)
+
+    def test_no_submissions(self):
+        self.client.force_login(self.staff_user)
+        self.assertTrue(self.get_dashboard().context['no_submissions'])
+
+    @override_settings(SESSION_DASHBOARD_CACHE_TIMEOUT=60)
+    def test_first_submission_shows_up_at_once(self):
+        self.client.force_login(self.staff_user)
+        self.add_questions(1)
+        self.assertTrue(self.get_dashboard().context['no_submissions'])
+        self.submit_scores([2])
+        self.assertFalse(self.get_dashboard().context.get('no_submissions'))
+
+    @override_settings(SESSION_DASHBOARD_CACHE_TIMEOUT=60)
+    def test_leaderboard_is_paginated_and_stats_cached(self):
+        self.client.force_login(self.staff_user)
+        self.add_questions(1, marks=100)
+        self.submit_scores(range(60))
+        self.get_dashboard()
+        # Auth, staff and quiz session, then the count and rows for the page; no aggregates
+        with self.assertNumQueries(6):
+            response = self.get_dashboard(page=2)
+        page = response.context['student_attempts']
+        self.assertEqual(len(page), 10)
+        self.assertEqual(page[0].score, 9)
+        self.assertContains(response, '<td>51</td>')
+
+
+class LiveDashboardTest(QuizTestMixin, TestCase):
+
+    def test_accumulator_matches_batch_statistics(self):
+        scores = [0, 2.5, 10, 9.5, 5, 0.9, 7.25]
+        accumulator = SessionAccumulator(10)
+        for attempt_id, score in enumerate(scores):
+            accumulator.add(attempt_id, attempt_id, QuizAttempt.STATUS_SUBMITTED, score)
+        # Counting an attempt twice, or one still in progress, changes nothing
+        accumulator.add(0, 0, QuizAttempt.STATUS_SUBMITTED, 0)
+        accumulator.add(99, 99, QuizAttempt.STATUS_STARTED, 0)
+        # A second submitted attempt by the same student counts once towards students
+        accumulator.add(100, 6, QuizAttempt.STATUS_SUBMITTED, 7.25)
+        self.assertEqual(accumulator.as_dict()['submitted'], 8)
+        self.assertEqual(accumulator.as_dict()['students'], 7)
+        self.assertEqual(accumulator.as_dict()['joined'], 8)
+        self.assertAlmostEqual(accumulator.mean, statistics.mean(scores + [7.25]))
+        self.assertAlmostEqual(accumulator.variance, statistics.pvariance(scores + [7.25]))
+        self.assertEqual(accumulator.bins, [2, 0, 1, 0, 0, 1, 0, 2, 0, 2])
+
+    @override_settings(SESSION_LIVE_POLL_INTERVAL=0)
+    async def test_stream_pushes_new_submissions(self):
+        await sync_to_async(self.add_questions)(5)
+        first, second = await sync_to_async(self.make_students)(2)
+        await QuizAttempt.objects.acreate(session=self.quiz_session, student=first, score=4,
+                                          status=QuizAttempt.STATUS_SUBMITTED)
+        await self.async_client.aforce_login(self.staff_user)
+        response = await self.async_client.get(reverse('session_dashboard_stream', args=[self.quiz_session.id]))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+
+        snapshot = (await anext(events)).decode()
+        self.assertTrue(snapshot.startswith('event: snapshot\n'))
+        self.assertEqual(json.loads(snapshot.split('data: ')[1])['histogram'], [0, 0, 0, 0, 1, 0, 0, 0, 0, 0])
+
+        await QuizAttempt.objects.acreate(session=self.quiz_session, student=second, score=8,
+                                          status=QuizAttempt.STATUS_SUBMITTED)
+        update = (await anext(events)).decode()
+        self.assertTrue(update.startswith('event: update\n'))
+        data = json.loads(update.split('data: ')[1])
+        self.assertEqual(data['submitted'], 2)
+        self.assertEqual(data['mean'], 6)
+        self.assertEqual(data['variance'], 4)
+        self.assertEqual(data['histogram_delta'], [0, 0, 0, 0, 0, 0, 0, 0, 1, 0])
+
+    async def open_stream(self):
+        await self.async_client.aforce_login(self.staff_user)
+        response = await self.async_client.get(reverse('session_dashboard_stream', args=[self.quiz_session.id]))
+        events = aiter(response.streaming_content)
+        self.assertTrue((await anext(events)).decode().startswith('event: snapshot\n'))
+        return events
+
+    @override_settings(SESSION_LIVE_POLL_INTERVAL=0)
+    async def test_stream_closes_when_the_session_is_deactivated(self):
+        events = await self.open_stream()
+        await QuizSession.objects.filter(id=self.quiz_session.id).aupdate(is_active=False)
+        self.assertTrue((await anext(events)).decode().startswith('event: closed\n'))
+        with self.assertRaises(StopAsyncIteration):
+            await anext(events)
+
+    @override_settings(SESSION_LIVE_POLL_INTERVAL=0, SESSION_LIVE_MAX_SECONDS=0)
+    async def test_stream_lifetime_is_capped(self):
+        events = await self.open_stream()
+        self.assertTrue((await anext(events)).decode().startswith('event: closed\n'))
+
+
+class SessionCodeTest(QuizTestMixin, TestCase):
+
+    def test_save_retries_a_taken_code(self):
+        QuizSession.objects.filter(pk=self.quiz_session.pk).update(session_code='TAKEN2')
+        with mock.patch('main_app.models._generate_session_code', side_effect=['TAKEN2', 'FRESH2']):
+            session = QuizSession.objects.create(quiz=self.quiz, created_by=self.staff)
+        self.assertEqual(session.session_code, 'FRESH2')
+        self.assertEqual(QuizSession.objects.filter(session_code='FRESH2').count(), 1)
+
+    def test_create_many_allocates_unique_codes(self):
+        QuizSession.objects.filter(pk=self.quiz_session.pk).update(session_code='TAKEN2')
+        # A clash within the batch is fixed before inserting, a clash with the table after the failed insert
+        codes = ['TAKEN2', 'SAME22', 'SAME22', 'OTHER2', 'NEXT22']
+        with mock.patch('main_app.models._generate_session_code', side_effect=codes):
+            sessions = QuizSession.create_many(
+                [QuizSession(quiz=self.quiz, created_by=self.staff) for _ in range(3)])
+        self.assertEqual(sorted(session.session_code for session in sessions), ['NEXT22', 'OTHER2', 'SAME22'])
+        self.assertTrue(all(session.pk for session in sessions))
+        self.assertEqual(self.quiz.sessions.count(), 4)
+
+    def test_create_sessions_for_sections(self):
+        self.client.force_login(self.staff_user)
+        response = self.client.post(reverse('quiz_session_create', args=[self.quiz.id]), {
+            'max_attempts_per_student': 1, 'is_active': 'on', 'sections': 12})
+        self.assertRedirects(response, reverse('quiz_detail', args=[self.quiz.id]), fetch_redirect_response=False)
+        codes = set(self.quiz.sessions.values_list('session_code', flat=True))
+        self.assertEqual(len(codes), 13)
+
+
+class SessionQrTest(QuizTestMixin, TestCase):
+
+    def get_qr(self, **params):
+        return self.client.get(reverse('session_qr', args=[self.quiz_session.id]), params)
+
+    def test_creating_a_session_is_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            QuizSession.objects.create(quiz=self.quiz, created_by=self.staff)
+        statements = [query['sql'].split()[0] for query in queries]
+        self.assertEqual(statements.count('INSERT'), 1)
+        self.assertNotIn('UPDATE', statements)
+
+    def test_rendered_once_and_cached(self):
+        self.client.force_login(self.staff_user)
+        with mock.patch('main_app.staff_views.render_session_qr', wraps=staff_views.render_session_qr) as render:
+            png = self.get_qr()
+            self.get_qr()
+            svg = self.get_qr(format='svg')
+        self.assertEqual(render.call_count, 2)
+        self.assertEqual(png['Content-Type'], 'image/png')
+        self.assertTrue(png.content.startswith(b'\x89PNG'))
+        self.assertEqual(svg['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', svg.content)
+        self.assertIn('max-age=', png['Cache-Control'])
+
+    def test_matching_etag_is_not_modified(self):
+        self.client.force_login(self.staff_user)
+        etag = self.get_qr()['ETag']
+        response = self.client.get(reverse('session_qr', args=[self.quiz_session.id]), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+
+class JoinQuizTest(QuizTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.student = self.make_students(1)[0]
+        self.client.force_login(self.student.admin)
+        self.add_questions(3)
+
+    def join(self, code):
+        return self.client.post(reverse('student_join_quiz'), {'session_code': code})
+
+    def test_join_and_lobby_use_the_snapshot(self):
+        lobby_url = reverse('quiz_lobby', args=[self.quiz_session.id])
+        self.assertRedirects(self.join(self.quiz_session.session_code.lower()), lobby_url,
+                             fetch_redirect_response=False)
+        self.assertContains(self.client.get(lobby_url), self.quiz.title)
+        with CaptureQueriesContext(connection) as queries:
+            self.join(self.quiz_session.session_code)
+            response = self.client.get(lobby_url)
+        # The student's attempt count is the only quiz query left
+        quiz_queries = [query['sql'] for query in queries if 'main_app_quiz' in query['sql']]
+        self.assertEqual(len(quiz_queries), 1)
+        self.assertIn('main_app_quizattempt', quiz_queries[0])
+        self.assertEqual(response.context['question_count'], 3)
+
+    def test_saving_the_session_invalidates_the_snapshot(self):
+        self.join(self.quiz_session.session_code)
+        self.quiz_session.is_active = False
+        self.quiz_session.save()
+        response = self.join(self.quiz_session.session_code)
+        self.assertRedirects(response, reverse('student_join_quiz'), fetch_redirect_response=False)
+
+    def test_local_memory_cache_is_not_used_as_the_shared_layer(self):
+        self.join(self.quiz_session.session_code)
+        # An edit from another process: no signal reaches this one, only the LRU TTL runs out
+        QuizSession.objects.filter(id=self.quiz_session.id).update(is_active=False)
+        session_snapshot._local.clear()
+        response = self.join(self.quiz_session.session_code)
+        self.assertRedirects(response, reverse('student_join_quiz'), fetch_redirect_response=False)
+
+    def test_lobby_resumes_an_open_attempt(self):
+        lobby_url = reverse('quiz_lobby', args=[self.quiz_session.id])
+        take_url = reverse('quiz_take', args=[self.quiz_session.id])
+        self.assertEqual(self.client.get(lobby_url).status_code, 200)
+        self.assertEqual(self.client.get(take_url).status_code, 200)
+        self.assertRedirects(self.client.get(lobby_url), take_url, fetch_redirect_response=False)
+        self.client.post(take_url, {})
+        self.assertRedirects(self.client.get(lobby_url), reverse('student_home'), fetch_redirect_response=False)
+
+    def test_unknown_code(self):
+        response = self.join('NOPE22')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Invalid session code')
+
+
+class FakePushServer:
+    """
+    A local stand-in for FCM: records each request and answers with queued status
+    codes (then 200), failing a token once if it is listed in token_errors.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.statuses = []
+        self.token_errors = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                server.requests.append({'body': body, 'authorization': self.headers['Authorization']})
+                status = server.statuses.pop(0) if server.statuses else 200
+                tokens = body.get('registration_ids') or [body.get('to')]
+                results = [{'error': server.token_errors.pop(token)} if token in server.token_errors
+                           else {'message_id': '1'} for token in tokens]
+                reply = json.dumps({'results': results}).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(reply)))
+                self.end_headers()
+                self.wfile.write(reply)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:%d/fcm/send' % self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class NotificationTestMixin(AttendanceTestMixin):
+    """Points FCM at a FakePushServer and sends inline; one student has a device token."""
+
+    def setUp(self):
+        super().setUp()
+        self.push_server = FakePushServer()
+        self.addCleanup(self.push_server.close)
+        self.enterContext(override_settings(FCM_URL=self.push_server.url, NOTIFICATION_EAGER=True,
+                                            NOTIFICATION_RETRY_BACKOFF=0))
+        self.client.force_login(self.make_user(1, "hod@example.com"))
+        self.student = self.make_students(1)[0]
+        self.student.admin.fcm_token = "device-token"
+        self.student.admin.save()
+
+
+class NotificationDispatchTest(NotificationTestMixin, TestCase):
+
+    def notify(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('send_student_notification'),
+                                    {'id': self.student.admin_id, 'message': "Exam moved"})
+
+    def test_notification_is_stored_then_pushed(self):
+        response = self.notify()
+        self.assertEqual(response.content, b"True")
+        self.assertEqual(NotificationStudent.objects.get().message, "Exam moved")
+        [request] = self.push_server.requests
+        self.assertEqual(request['body']['to'], "device-token")
+        self.assertEqual(request['body']['notification']['body'], "Exam moved")
+        self.assertTrue(request['authorization'].startswith('key='))
+
+    def test_transient_failures_are_retried(self):
+        self.push_server.statuses = [503, 500]
+        self.notify()
+        self.assertEqual(len(self.push_server.requests), 3)
+        self.assertFalse(FailedNotification.objects.exists())
+
+    @override_settings(NOTIFICATION_MAX_ATTEMPTS=2)
+    def test_undeliverable_notifications_are_dead_lettered(self):
+        self.push_server.statuses = [503, 503]
+        self.assertEqual(self.notify().content, b"True")
+        failed = FailedNotification.objects.get()
+        self.assertEqual((failed.recipient_id, failed.attempts), (self.student.admin_id, 2))
+        self.assertEqual(failed.payload['body'], "Exam moved")
+
+        # A recipient who has since lost their token is left for a later run
+        tokenless = self.make_user(3, "tokenless@test.com")
+        FailedNotification.objects.create(recipient=tokenless, payload=failed.payload, attempts=1)
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('retry_failed_notifications', stdout=out)
+        self.assertEqual(len(self.push_server.requests), 3)
+        self.assertEqual(FailedNotification.objects.get().recipient, tokenless)
+        self.assertIn("Queued 1 failed notifications", out.getvalue())
+        self.assertIn("Skipped 1 without a device token", out.getvalue())
+
+    def test_rejected_token_is_not_retried(self):
+        self.push_server.statuses = [400]
+        self.notify()
+        self.assertEqual(len(self.push_server.requests), 1)
+        self.assertEqual(FailedNotification.objects.get().attempts, 1)
+
+
+class BroadcastNotificationTest(NotificationTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        other_course = Course.objects.create(name="History")
+        self.students = self.make_students(5, start=10)
+        for i, student in enumerate(self.students):
+            student.admin.fcm_token = "token-%d" % i if i != 4 else ""
+            student.admin.save()
+        Student.objects.filter(id=self.students[3].id).update(course=other_course)
+
+    def broadcast(self, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('send_bulk_notification'), {'message': "Fees due", **data})
+
+    @override_settings(FCM_MULTICAST_SIZE=2)
+    def test_course_broadcast(self):
+        self.push_server.token_errors = {'token-1': 'Unavailable', 'token-2': 'NotRegistered'}
+        # Session and user, the course lookup, one roster query, one INSERT for all rows
+        # (in a savepoint) and one for the dead letter
+        with self.assertNumQueries(8):
+            response = self.broadcast(target='course', id=self.course.id)
+        # The student from setUp plus four of the new ones
+        self.assertEqual(response.json(), {'sent': 5})
+        self.assertEqual(NotificationStudent.objects.filter(message="Fees due").count(), 5)
+        sent = [request['body'].get('registration_ids') or [request['body']['to']] for request in self.push_server.requests]
+        # Chunks of two tokens; the unavailable token is retried alone
+        self.assertEqual(sent, [['device-token', 'token-0'], ['token-1', 'token-2'], ['token-1']])
+        self.assertEqual(list(FailedNotification.objects.values_list('recipient_id', 'error')),
+                         [(self.students[2].admin_id, 'NotRegistered')])
+
+    def test_staff_broadcast(self):
+        self.assertEqual(self.broadcast(target='staff').json(), {'sent': 1})
+        self.assertEqual(NotificationStaff.objects.get().staff, self.staff)
+
+    def test_unknown_target(self):
+        self.assertEqual(self.broadcast(target='everyone').status_code, 400)
+
+    def test_course_and_session_ids_are_checked(self):
+        self.assertEqual(self.broadcast(target='course').status_code, 400)
+        self.assertEqual(self.broadcast(target='session', id='abc').status_code, 400)
+        self.assertEqual(self.broadcast(target='course', id=9999).status_code, 404)
+        self.assertEqual(self.broadcast(target='session', id=self.session.id).json(), {'sent': 6})
+
+    def test_only_the_hod_can_broadcast(self):
+        self.client.force_login(self.staff_user)
+        self.assertEqual(self.broadcast(target='students').status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.broadcast(target='students').status_code, 302)
+        self.assertFalse(NotificationStudent.objects.exists())
+
+
+@override_settings(OUTBOUND_HTTP_BREAKER_THRESHOLD=2, OUTBOUND_HTTP_BREAKER_COOLDOWN=60)
+class HttpClientTest(TestCase):
+
+    def setUp(self):
+        self.server = FakePushServer()
+        self.addCleanup(self.server.close)
+
+    def post(self):
+        return http_client.post(self.server.url, json={'to': 'token'})
+
+    def test_sessions_are_pooled_per_host(self):
+        self.post()
+        self.post()
+        client = http_client.client_for(self.server.url)
+        self.assertIs(http_client.client_for(self.server.url + '?other'), client)
+        self.assertEqual(client.stats()['calls'], 2)
+        self.assertIn(client.host, http_client.latency_stats())
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        self.server.statuses = [500, 502]
+        self.assertEqual(self.post().status_code, 500)
+        self.assertEqual(self.post().status_code, 502)
+        with self.assertRaises(http_client.CircuitOpenError):
+            self.post()
+        self.assertEqual(len(self.server.requests), 2)
+        stats = http_client.client_for(self.server.url).stats()
+        self.assertEqual((stats['calls'], stats['failures'], stats['circuit_open']), (2, 2, True))
+
+    def test_successful_trial_call_closes_the_circuit(self):
+        self.server.statuses = [500, 500]
+        self.post()
+        with override_settings(OUTBOUND_HTTP_BREAKER_COOLDOWN=0):
+            self.post()
+            self.assertEqual(self.post().status_code, 200)
+        self.assertEqual(self.post().status_code, 200)
+        self.assertFalse(http_client.client_for(self.server.url).stats()['circuit_open'])
@@ -34,6 +34,8 @@ urlpatterns = [
          name='send_student_notification'),
     path("send_staff_notification/", hod_views.send_staff_notification,
          name='send_staff_notification'),
+    path("send_bulk_notification/", hod_views.send_bulk_notification,
+         name='send_bulk_notification'),
     path("add_session/", hod_views.add_session, name='add_session'),
     path("admin_notify_student", hod_views.admin_notify_student,
          name='admin_notify_student'),
@@ -102,7 +104,7 @@ urlpatterns = [
          name='get_student_attendance'),
     path("staff/attendance/save/",
          staff_views.save_attendance, name='save_attendance'),
-    path("staff/attendance/update/",
+    path("staff/attendance/update/save/",
          staff_views.update_attendance, name='update_attendance'),
     path("staff/fcmtoken/", staff_views.staff_fcmtoken, name='staff_fcmtoken'),
     path("staff/view/notification/", staff_views.staff_view_notification,
@@ -123,7 +125,9 @@ urlpatterns = [
      path("staff/question/<int:question_id>/add-choice/", staff_views.choice_add, name="choice_add"),
      path('staff/quiz/<int:quiz_id>/session/create/', staff_views.quiz_session_create, name='quiz_session_create'),
      path("staff/session/<int:session_id>/", staff_views.session_detail, name="session_detail"),
+     path("staff/session/<int:session_id>/qr/", staff_views.session_qr, name="session_qr"),
      path('staff/session/<int:session_id>/dashboard/', staff_views.session_dashboard, name='session_dashboard'),
+     path('staff/session/<int:session_id>/dashboard/live/', staff_views.session_dashboard_stream, name='session_dashboard_stream'),
 
 
 
@@ -148,6 +152,7 @@ urlpatterns = [
      path('student/quiz/join/', student_views.student_join_quiz, name='student_join_quiz'),
      path('student/quiz/<int:session_id>/lobby/', student_views.quiz_lobby, name='quiz_lobby'),
      path('student/quiz/<int:session_id>/take/', student_views.quiz_take, name='quiz_take'),
+     path('student/quiz/attempt/<int:attempt_id>/autosave/', student_views.quiz_autosave, name='quiz_autosave'),
      path('student/quiz/attempt/<int:attempt_id>/result/', student_views.quiz_result, name='quiz_result'),
      
 
@@ -1,11 +1,11 @@
 import json
-import requests
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render, reverse
 from django.views.decorators.csrf import csrf_exempt
 
+from . import http_client
 from .EmailBackend import EmailBackend
 from .models import Attendance, Session, Subject
 
@@ -37,7 +37,7 @@ def doLogin(request, **kwargs):
         }
         # Make request
         try:
-            captcha_server = requests.post(url=captcha_url, data=data)
+            captcha_server = http_client.post(captcha_url, data=data)
             response = json.loads(captcha_server.text)
             if response['success'] == False:
                 messages.error(request, 'Invalid Captcha. Try Again')
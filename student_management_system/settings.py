@@ -165,7 +165,80 @@ EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_PASSWORD')
 EMAIL_USE_TLS = True
 # DEFAULT_FROM_EMAIL = "Student Management System <admin@admin.com>"
 
+# Cache shared by every worker. Without REDIS_URL each process gets its own
+# local-memory cache, which cannot see invalidations made by other processes
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds to cache each staff member's dashboard numbers; 0 disables the cache
+STAFF_HOME_CACHE_TIMEOUT = int(os.getenv('STAFF_HOME_CACHE_TIMEOUT', 0))
+
+# Seconds the quiz session dashboard aggregates are shared between refreshes
+SESSION_DASHBOARD_CACHE_TIMEOUT = int(os.getenv('SESSION_DASHBOARD_CACHE_TIMEOUT', 10))
+
+# Live dashboard stream: seconds between polls for new attempts, and how far
+# each poll looks back to catch attempts that committed out of order
+SESSION_LIVE_POLL_INTERVAL = float(os.getenv('SESSION_LIVE_POLL_INTERVAL', 2))
+SESSION_LIVE_OVERLAP = float(os.getenv('SESSION_LIVE_OVERLAP', 5))
+# Longest a single stream stays open, in seconds, even if the session never ends
+SESSION_LIVE_MAX_SECONDS = float(os.getenv('SESSION_LIVE_MAX_SECONDS', 60 * 60))
+
+# Seconds a rendered session QR code is cached, server-side and by browsers
+QR_CODE_CACHE_TIMEOUT = int(os.getenv('QR_CODE_CACHE_TIMEOUT', 60 * 60 * 24))
+
+# Session snapshots used by join/lobby: shared cache timeout, plus a per-process
+# LRU whose entries expire after SESSION_SNAPSHOT_LOCAL_TTL seconds. The shared
+# layer is skipped unless CACHES is shared (REDIS_URL), so without it an edit made
+# in another process shows up within SESSION_SNAPSHOT_LOCAL_TTL
+SESSION_SNAPSHOT_CACHE_TIMEOUT = int(os.getenv('SESSION_SNAPSHOT_CACHE_TIMEOUT', 300))
+SESSION_SNAPSHOT_LOCAL_TTL = float(os.getenv('SESSION_SNAPSHOT_LOCAL_TTL', 5))
+SESSION_SNAPSHOT_LRU_SIZE = int(os.getenv('SESSION_SNAPSHOT_LRU_SIZE', 1024))
+
+# Seconds a compiled quiz (questions, choices, rendered markup) stays cached; edits invalidate it
+QUIZ_PAYLOAD_CACHE_TIMEOUT = int(os.getenv('QUIZ_PAYLOAD_CACHE_TIMEOUT', 24 * 60 * 60))
+
+# Quiz attempt geolocation runs in a background thread pool after the attempt is saved
+GEOLOCATION_RESOLVER = os.getenv('GEOLOCATION_RESOLVER', 'main_app.geolocation.ipapi_lookup')
+GEOLOCATION_CACHE_TTL = int(os.getenv('GEOLOCATION_CACHE_TTL', 24 * 60 * 60))
+GEOLOCATION_WORKERS = int(os.getenv('GEOLOCATION_WORKERS', 2))
+GEOLOCATION_EAGER = False  # Run lookups inline, e.g. in tests
+# Used by main_app.geolocation.local_lookup: a start_ip,end_ip,latitude,longitude .csv, or a
+# binary file built from one with `manage.py build_geoip_database` (memory-mapped)
+GEOLOCATION_DATABASE = os.getenv('GEOLOCATION_DATABASE', BASE_DIR / 'geoip' / 'ranges.bin')
+GEOLOCATION_FALLBACK_RESOLVER = os.getenv('GEOLOCATION_FALLBACK_RESOLVER', '')
+
+# Outbound HTTP (reCAPTCHA, ipapi, FCM) goes through main_app.http_client: a pooled
+# session per host, default (connect, read) timeouts and a per-host circuit breaker
+OUTBOUND_HTTP_TIMEOUT = (3.05, 10)
+OUTBOUND_HTTP_POOL_SIZE = int(os.getenv('OUTBOUND_HTTP_POOL_SIZE', 10))
+OUTBOUND_HTTP_BREAKER_THRESHOLD = int(os.getenv('OUTBOUND_HTTP_BREAKER_THRESHOLD', 5))
+OUTBOUND_HTTP_BREAKER_COOLDOWN = float(os.getenv('OUTBOUND_HTTP_BREAKER_COOLDOWN', 30))
+
+# Push notifications (FCM) are sent by a background worker pool with retries;
+# undeliverable ones are kept in FailedNotification
+FCM_URL = os.getenv('FCM_URL', 'https://fcm.googleapis.com/fcm/send')
+FCM_SERVER_KEY = os.getenv('FCM_SERVER_KEY', '')
+FCM_MULTICAST_SIZE = 1000  # FCM accepts at most 1000 registration_ids per request
+NOTIFICATION_WORKERS = int(os.getenv('NOTIFICATION_WORKERS', 4))
+NOTIFICATION_QUEUE_SIZE = int(os.getenv('NOTIFICATION_QUEUE_SIZE', 1000))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', 4))
+NOTIFICATION_RETRY_BACKOFF = float(os.getenv('NOTIFICATION_RETRY_BACKOFF', 1))  # seconds, doubled per retry
+NOTIFICATION_EAGER = False  # Send inline, e.g. in tests
+
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
-prod_db = dj_database_url.config(conn_max_age=500)
+# Served over ASGI (see Procfile): sync views run in per-request threads, so persistent
+# connections would leak one per thread. Connections are closed after each request
+prod_db = dj_database_url.config(conn_max_age=0)
 DATABASES['default'].update(prod_db)